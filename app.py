@@ -1,16 +1,51 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, send_from_directory
+from flask import Flask, Request, Response, session, render_template, redirect, url_for, flash, request, jsonify, send_file, abort, g, has_app_context, has_request_context, stream_with_context, before_render_template, template_rendered
+from sqlalchemy import tuple_, event, func, text, bindparam, inspect as sa_inspect, TextClause
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload, selectinload, make_transient_to_detached, aliased
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_mail import Mail, Message
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join, DEFAULT_PBKDF2_ITERATIONS
+from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
 import time
+import threading
+import hashlib
+import tempfile
+import sqlite3
+import glob
+import re
+import multiprocessing
+import mimetypes
+import html
+import click
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from abc import ABC, abstractmethod
+from PIL import Image, ImageOps
 from flask_wtf.csrf import CSRFProtect
 import uuid
+import contextvars
+import cProfile
+import bisect
+import random
+import statistics
+import tracemalloc
+import json
+import base64
+import binascii
+from collections import namedtuple, OrderedDict
+from functools import wraps, partial
+from contextlib import contextmanager
 from flask_migrate import Migrate
+from markupsafe import Markup, escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
 
 # Load environment variables
 load_dotenv()
@@ -19,8 +54,63 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///cms.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Connection pool per worker process
+app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 5))
+app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', 30))  # seconds to wait for a free connection
+app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', -1))  # seconds, -1 keeps connections open
+# SQLite profile applied to every new connection: WAL lets readers run alongside the single writer,
+# and writers wait up to SQLITE_BUSY_TIMEOUT ms for the lock instead of failing with "database is locked"
+app.config['SQLITE_JOURNAL_MODE'] = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))
+app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # bytes, 0 disables
+app.config['SQLITE_CACHE_SIZE'] = int(os.getenv('SQLITE_CACHE_SIZE', -64000))  # negative is KiB, positive is pages
+app.config['SQLITE_FOREIGN_KEYS'] = os.getenv('SQLITE_FOREIGN_KEYS', 'true').lower() in ['true', 'on', '1']
+# Optional read replica; views marked read_replica run their SELECTs against it
+app.config['DATABASE_REPLICA_URL'] = os.getenv('DATABASE_REPLICA_URL')
+# Seconds a client keeps reading from the primary after it writes, to cover replication lag
+app.config['REPLICA_STICKY_SECONDS'] = float(os.getenv('REPLICA_STICKY_SECONDS', 5))
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Uploads are streamed to disk, so the cap only bounds disk use, not worker memory
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 100 * 1024 * 1024))  # 100MB max file size
+# Password hashing cost, e.g. 'pbkdf2:sha256:600000' or 'scrypt:32768:8:1'
+app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+# Hashes run on a small thread pool; logins beyond MAX_PENDING wait up to the timeout (by default
+# not at all), then get a 503, so a burst of logins can't hold every request worker
+app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', app.config['PASSWORD_HASH_WORKERS']))
+app.config['PASSWORD_HASH_WAIT_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_WAIT_TIMEOUT', 0))
+# Identity cache for the user loaded on every authenticated request
+app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', 1024))
+app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 300))  # seconds
+# Rendered public pages kept per worker
+app.config['PAGE_CACHE_SIZE'] = int(os.getenv('PAGE_CACHE_SIZE', 512))
+# Raise instead of logging when a route exceeds its query budget (defaults to on under TESTING)
+app.config['QUERY_BUDGET_STRICT'] = os.getenv('QUERY_BUDGET_STRICT', '').lower() in ['true', 'on', '1'] or None
+# Opt-in per-request timing: a Server-Timing header plus a log line for requests slower than SLOW_REQUEST_MS
+app.config['PROFILE_REQUESTS'] = os.getenv('PROFILE_REQUESTS', '').lower() in ['true', 'on', '1']
+app.config['SLOW_REQUEST_MS'] = float(os.getenv('SLOW_REQUEST_MS', 500))
+# Fraction of timed requests run under cProfile; the profile is saved to PROFILE_DIR when the request is slow
+app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+# Prometheus metrics: each worker writes its values here at most every METRICS_FLUSH_INTERVAL seconds
+app.config['METRICS_DIR'] = os.getenv('METRICS_DIR', os.path.join(app.instance_path, 'metrics'))
+app.config['METRICS_FLUSH_INTERVAL'] = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+# Bearer token required by /metrics when set
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+
+# Resized variants generated for uploaded images, used for srcset
+app.config['IMAGE_VARIANT_WIDTHS'] = [int(width) for width in os.getenv('IMAGE_VARIANT_WIDTHS', '320,640,1280').split(',')]
+app.config['IMAGE_VARIANT_FORMAT'] = os.getenv('IMAGE_VARIANT_FORMAT', 'WEBP')
+app.config['IMAGE_VARIANT_QUALITY'] = int(os.getenv('IMAGE_VARIANT_QUALITY', 80))
+app.config['IMAGE_WORKERS'] = int(os.getenv('IMAGE_WORKERS', 2))  # 0 renders inline in the request
+
+# How /media responses hand the bytes over: '' streams from Python, 'x-sendfile' (Apache,
+# lighttpd) or 'x-accel-redirect' (nginx, serving MEDIA_ACCEL_PREFIX as an internal location)
+app.config['MEDIA_SENDFILE'] = os.getenv('MEDIA_SENDFILE', '').lower()
+app.config['MEDIA_ACCEL_PREFIX'] = os.getenv('MEDIA_ACCEL_PREFIX', '/_uploads/')
+app.config['USE_X_SENDFILE'] = app.config['MEDIA_SENDFILE'] == 'x-sendfile'
 
 # Create uploads directory if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -33,9 +123,146 @@ app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
 
+# Mail outbox: messages are stored with the change that triggers them and sent in the background
+app.config['MAIL_OUTBOX_BACKGROUND'] = os.getenv('MAIL_OUTBOX_BACKGROUND', 'true').lower() in ['true', 'on', '1']
+app.config['MAIL_OUTBOX_BATCH_SIZE'] = int(os.getenv('MAIL_OUTBOX_BATCH_SIZE', 50))
+app.config['MAIL_OUTBOX_MAX_ATTEMPTS'] = int(os.getenv('MAIL_OUTBOX_MAX_ATTEMPTS', 6))
+app.config['MAIL_OUTBOX_RETRY_DELAY'] = int(os.getenv('MAIL_OUTBOX_RETRY_DELAY', 30))  # seconds, doubled per attempt
+app.config['MAIL_OUTBOX_POLL_INTERVAL'] = int(os.getenv('MAIL_OUTBOX_POLL_INTERVAL', 30))  # seconds
+app.config['MAIL_OUTBOX_LEASE'] = int(os.getenv('MAIL_OUTBOX_LEASE', 300))  # seconds before a claimed batch is retried
+
+# Streaming uploads
+class UploadStream:
+    """Temporary file in the upload folder that counts and hashes bytes as they are written.
+
+    Used as the form parser's file stream, so an upload is written to disk,
+    sized and checksummed in one pass and then moved into place by commit().
+    """
+
+    def __init__(self, directory):
+        fd, self.temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        self._file = os.fdopen(fd, 'w+b')
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.committed = False
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def commit(self, path):
+        self._file.close()
+        os.replace(self.temp_path, path)
+        self.committed = True
+
+    def discard(self):
+        self._file.close()
+        if not self.committed:
+            try:
+                os.remove(self.temp_path)
+            except OSError:
+                pass
+
+class StreamingRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        stream = UploadStream(app.config['UPLOAD_FOLDER'])
+        self.__dict__.setdefault('upload_streams', []).append(stream)
+        return stream
+
+app.request_class = StreamingRequest
+
+@app.teardown_request
+def discard_uploads(exc):
+    # Remove temporary files for uploads that were rejected or never committed
+    for stream in request.__dict__.get('upload_streams', []):
+        stream.discard()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe('cms_db_pool_checkout_wait_seconds', time.perf_counter() - started)
+
+database_url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+if not (database_url.get_backend_name() == 'sqlite' and database_url.database in (None, '', ':memory:')):
+    engine_options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    engine_options.setdefault('poolclass', TimedQueuePool)
+    engine_options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+    engine_options.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+    engine_options.setdefault('pool_timeout', app.config['DB_POOL_TIMEOUT'])
+    engine_options.setdefault('pool_recycle', app.config['DB_POOL_RECYCLE'])
+if app.config['DATABASE_REPLICA_URL']:
+    app.config.setdefault('SQLALCHEMY_BINDS', {})['replica'] = dict(
+        app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}), url=app.config['DATABASE_REPLICA_URL']
+    )
+
+def sqlite_pragmas(config):
+    """The connection pragmas of the SQLite profile, in the order they are applied"""
+    return {
+        # First, so switching the journal mode waits for other connections' locks
+        'busy_timeout': config['SQLITE_BUSY_TIMEOUT'],
+        'journal_mode': config['SQLITE_JOURNAL_MODE'],
+        'synchronous': config['SQLITE_SYNCHRONOUS'],
+        'mmap_size': config['SQLITE_MMAP_SIZE'],
+        'cache_size': config['SQLITE_CACHE_SIZE'],
+        'foreign_keys': 'ON' if config['SQLITE_FOREIGN_KEYS'] else 'OFF',
+    }
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+@event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        apply_sqlite_pragmas(dbapi_connection, sqlite_pragmas(app.config))
+
+class RoutingSession(Session):
+    """Session that sends the SELECTs of read-only views to the replica bind.
+
+    DML statements, textual statements other than SELECT, flushes and bare
+    session.connection() calls (clause is None) mark the request as a writer,
+    and from then on its reads stay on the primary so it sees its own writes.
+    Anything else that is not a read (DDL, pragmas) runs on the primary
+    without changing where later reads go.
+    """
+
+    # A textual WITH may end in UPDATE (see CATEGORY_PATHS_SQL), so only a leading SELECT reads
+    READ_TEXT = re.compile(r'\s*SELECT\b', re.IGNORECASE)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            if isinstance(clause, TextClause):
+                is_read = bool(self.READ_TEXT.match(clause.text))
+                is_write = not is_read
+            else:
+                is_read = getattr(clause, 'is_select', False)
+                is_write = clause is None or getattr(clause, 'is_dml', False)
+            if is_write:
+                g.wrote_primary = True
+            elif is_read and g.get('read_replica') and not g.get('wrote_primary') and 'replica' in self._db.engines:
+                return self._db.engines['replica']
+        return super().get_bind(mapper, clause, bind, **kwargs)
+
 # Initialize extensions
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)  # Initialize Flask-Migrate
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+def include_object(obj, name, type_, reflected, compare_to):
+    """Keep autogenerate away from the full-text search table and its FTS5 shadow tables"""
+    return not (type_ == 'table' and name.startswith('post_fts'))
+
+migrate = Migrate(app, db, include_object=include_object)  # Initialize Flask-Migrate
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Please log in to access this page.'
@@ -43,11 +270,80 @@ login_manager.login_message_category = 'info'
 mail = Mail(app)
 csrf = CSRFProtect(app)  # Initialize CSRF protection
 
+# Password hashing
+class PasswordHasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    """Hashes and verifies passwords at a configurable cost on a bounded thread pool.
+
+    hashlib releases the GIL while hashing, so the pool caps how many CPU
+    cores a burst of logins can occupy. At most max_pending request threads
+    wait on it; further callers wait up to wait_timeout seconds (none by
+    default) and then get PasswordHasherBusy, so a login storm cannot tie up
+    every request worker.
+    """
+
+    def __init__(self, method, workers, max_pending, wait_timeout):
+        self.method = method
+        self.wait_timeout = wait_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pwhash') if workers > 0 else None
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _run(self, func, *args):
+        started = time.perf_counter()
+        try:
+            if self._executor is None:
+                return func(*args)
+            if not self._slots.acquire(timeout=self.wait_timeout):
+                raise PasswordHasherBusy('Too many password checks in progress')
+            try:
+                return self._executor.submit(func, *args).result()
+            finally:
+                self._slots.release()
+        finally:
+            record_timing('hash', time.perf_counter() - started)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def canonical_method(self):
+        """The method prefix Werkzeug stores, with its defaults filled in (e.g. 'pbkdf2' -> 'pbkdf2:sha256:600000')"""
+        name, *args = self.method.split(':')
+        if name == 'scrypt' and not args:
+            args = [2 ** 15, 8, 1]
+        elif name == 'pbkdf2':
+            args = (args or ['sha256'])[:2]
+            if len(args) == 1:
+                args.append(DEFAULT_PBKDF2_ITERATIONS)
+        return ':'.join([name, *map(str, args)])
+
+    def needs_rehash(self, pwhash):
+        """True when a stored hash was made with a different method or cost than configured"""
+        return not pwhash or pwhash.split('$', 1)[0] != self.canonical_method()
+
+password_hasher = PasswordHasher(
+    app.config['PASSWORD_HASH_METHOD'],
+    app.config['PASSWORD_HASH_WORKERS'],
+    app.config['PASSWORD_HASH_MAX_PENDING'],
+    app.config['PASSWORD_HASH_WAIT_TIMEOUT']
+)
+
 # Add context processor for current datetime
 @app.context_processor
 def inject_now():
     return {'now': datetime.now()}
 
+# Add context processor for the cached site settings
+@app.context_processor
+def inject_settings():
+    return {'site_settings': settings_cache.get()}
+
 # Models
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -61,10 +357,10 @@ class User(UserMixin, db.Model):
     reset_token = db.Column(db.String(128))
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
 class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -72,6 +368,10 @@ class Post(db.Model):
     slug = db.Column(db.String(200), unique=True, nullable=False)
     content = db.Column(db.Text)
     excerpt = db.Column(db.Text)
+    # Filled from content at save time by render_post_content
+    content_html = db.Column(db.Text)
+    word_count = db.Column(db.Integer)
+    reading_time = db.Column(db.Integer)  # minutes
     featured_image = db.Column(db.String(200))
     status = db.Column(db.String(20), default='draft')
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -79,15 +379,33 @@ class Post(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     categories = db.relationship('Category', secondary='post_categories')
 
+    # Composite indexes backing the keyset pagination in admin_posts, one per
+    # sort mode with and without the status filter
+    __table_args__ = (
+        db.Index('ix_post_created_at_id', 'created_at', 'id'),
+        db.Index('ix_post_title_id', 'title', 'id'),
+        db.Index('ix_post_status_id', 'status', 'id'),
+        db.Index('ix_post_status_created_at_id', 'status', 'created_at', 'id'),
+        db.Index('ix_post_status_title_id', 'status', 'title', 'id'),
+    )
+
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     slug = db.Column(db.String(100), unique=True, nullable=False)
     description = db.Column(db.Text)
     parent_id = db.Column(db.Integer, db.ForeignKey('category.id'))
+    # Materialized path of ids from the root, e.g. '/3/8/21/', kept in step with parent_id
+    path = db.Column(db.String(255))
+    depth = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     posts = db.relationship('Post', secondary='post_categories')
 
+    __table_args__ = (
+        # Pattern ops so PostgreSQL can serve prefix LIKE from the index under any collation
+        db.Index('ix_category_path', 'path', postgresql_ops={'path': 'text_pattern_ops'}),
+    )
+
 class Settings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     site_name = db.Column(db.String(100), default='My CMS')
@@ -113,18 +431,2337 @@ class Media(db.Model):
     original_filename = db.Column(db.String(255), nullable=False)
     file_type = db.Column(db.String(50))
     file_size = db.Column(db.Integer)
+    checksum = db.Column(db.String(64), index=True)  # SHA-256 hex digest, links to MediaBlob
+    width = db.Column(db.Integer)  # set for images once variants are generated
+    height = db.Column(db.Integer)
     uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    variants = db.relationship('MediaVariant', backref='media', cascade='all, delete-orphan',
+                               order_by='MediaVariant.width')
+
+    # Keyset pagination of the media library, newest first, optionally filtered
+    __table_args__ = (
+        db.Index('ix_media_created_at_id', 'created_at', 'id'),
+        db.Index('ix_media_file_type_created_at_id', 'file_type', 'created_at', 'id'),
+        db.Index('ix_media_uploaded_by_created_at_id', 'uploaded_by', 'created_at', 'id'),
+    )
+
+    @property
+    def file_path(self):
+        return url_for('serve_media', filename=self.filename)
+
+class MediaVariant(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    media_id = db.Column(db.Integer, db.ForeignKey('media.id'), nullable=False, index=True)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    path = db.Column(db.String(255), nullable=False)  # relative to UPLOAD_FOLDER
+    file_size = db.Column(db.Integer)
+
+# Content-addressed file shared by every Media row with the same bytes
+class MediaBlob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    checksum = db.Column(db.String(64), unique=True, nullable=False)
+    path = db.Column(db.String(255), nullable=False)  # relative to UPLOAD_FOLDER
+    size = db.Column(db.Integer)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class MailOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    recipients = db.Column(db.Text, nullable=False)  # comma separated
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32))
+    claimed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_mail_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+# Single-row counter cache read by the dashboard, kept in step by the write paths
+class SiteStats(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    posts = db.Column(db.Integer, nullable=False, default=0)
+    posts_published = db.Column(db.Integer, nullable=False, default=0)
+    posts_draft = db.Column(db.Integer, nullable=False, default=0)
+    categories = db.Column(db.Integer, nullable=False, default=0)
+    users = db.Column(db.Integer, nullable=False, default=0)
+    media = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 # Association table for posts and categories
 post_categories = db.Table('post_categories',
     db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
-    db.Column('category_id', db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    db.Column('category_id', db.Integer, db.ForeignKey('category.id'), primary_key=True),
+    # The primary key leads with post_id; per-category lookups need their own index
+    db.Index('ix_post_categories_category_id', 'category_id', 'post_id')
+)
+
+# Keyset (cursor) pagination
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'prev_cursor'])
+
+def encode_cursor(columns, row):
+    values = []
+    for column in columns:
+        value = getattr(row, column.key)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(columns, cursor):
+    """Decode a cursor into column values, or None if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        decoded = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if python_type is datetime:
+                if not isinstance(value, str):
+                    return None
+                value = datetime.fromisoformat(value)
+            elif not isinstance(value, python_type) or isinstance(value, bool):
+                return None
+            decoded.append(value)
+        return decoded
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+def keyset_page(query, columns, descending, per_page, after=None, before=None):
+    """Fetch one page of query ordered by columns, starting after/before a cursor"""
+    key = tuple_(*columns)
+    after_values = decode_cursor(columns, after) if after else None
+    before_values = decode_cursor(columns, before) if before else None
+
+    # Walking backwards flips both the comparison and the ordering
+    backwards = before_values is not None
+    if backwards:
+        query = query.filter(key > tuple_(*before_values) if descending else key < tuple_(*before_values))
+    elif after_values is not None:
+        query = query.filter(key < tuple_(*after_values) if descending else key > tuple_(*after_values))
+
+    reverse = descending != backwards
+    query = query.order_by(*[column.desc() if reverse else column.asc() for column in columns])
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage(rows, None, None)
+    if backwards:
+        next_cursor = encode_cursor(columns, rows[-1])
+        prev_cursor = encode_cursor(columns, rows[0]) if has_more else None
+    else:
+        next_cursor = encode_cursor(columns, rows[-1]) if has_more else None
+        prev_cursor = encode_cursor(columns, rows[0]) if after_values is not None else None
+    return KeysetPage(rows, next_cursor, prev_cursor)
+
+# Sort mode -> (keyset columns, descending)
+POST_SORTS = {
+    'newest': ((Post.created_at, Post.id), True),
+    'oldest': ((Post.created_at, Post.id), False),
+    'title': ((Post.title, Post.id), False),
+    'status': ((Post.status, Post.id), False),
+}
+
+MEDIA_KEYSET = (Media.created_at, Media.id)
+MEDIA_PAGE_SIZE = 50
+
+def filter_media(query, args):
+    """Apply the media library filters: file_type (exact, or a prefix ending in '/') and uploaded_by"""
+    file_type = args.get('file_type')
+    if file_type:
+        if file_type.endswith('/'):
+            query = query.filter(Media.file_type.startswith(file_type, autoescape=True))
+        else:
+            query = query.filter(Media.file_type == file_type)
+    uploaded_by = args.get('uploaded_by', type=int)
+    if uploaded_by:
+        query = query.filter(Media.uploaded_by == uploaded_by)
+    return query
+
+def get_posts_per_page():
+    posts_per_page = settings_cache.get().posts_per_page
+    if posts_per_page and posts_per_page > 0:
+        return posts_per_page
+    return 10
+
+# Query budget
+class QueryBudgetExceeded(Exception):
+    pass
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+def query_budget(max_queries):
+    """Fail the request (or warn outside tests) when the view runs more than max_queries queries.
+
+    Budgets count the settings cache load, which only runs when the snapshot is cold.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            start = g.get('query_count', 0)
+            response = f(*args, **kwargs)
+            used = g.get('query_count', 0) - start
+            if used > max_queries:
+                message = f'{request.endpoint} ran {used} queries, budget is {max_queries}'
+                strict = app.config['QUERY_BUDGET_STRICT']
+                if strict or (strict is None and app.testing):
+                    raise QueryBudgetExceeded(message)
+                app.logger.warning(message)
+            return response
+        return decorated_function
+    return decorator
+
+# Read replica routing
+def read_replica(f):
+    """Run the view's reads on the replica, unless this client wrote within REPLICA_STICKY_SECONDS"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if session.get('primary_until', 0) < time.time():
+            g.read_replica = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+@contextmanager
+def on_primary():
+    """Read from the primary inside the block, e.g. for values that get cached"""
+    if not has_app_context():
+        yield
+        return
+    previous = g.get('read_replica', False)
+    g.read_replica = False
+    try:
+        yield
+    finally:
+        g.read_replica = previous
+
+@app.after_request
+def pin_writer_to_primary(response):
+    # The replica may not have this client's write yet, so its next reads go to the primary
+    if app.config['DATABASE_REPLICA_URL'] and g.get('wrote_primary'):
+        session['primary_until'] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+@app.cli.command('snapshot-replica')
+def snapshot_replica_command():
+    """Copy the SQLite primary over the SQLite replica, for trying replica routing locally."""
+    if 'replica' not in db.engines:
+        raise click.ClickException('Set DATABASE_REPLICA_URL first')
+    primary, replica = db.engines[None], db.engines['replica']
+    if primary.url.get_backend_name() != 'sqlite' or replica.url.get_backend_name() != 'sqlite':
+        raise click.ClickException('snapshot-replica copies SQLite files; use your database\'s replication otherwise')
+    # Drop pooled replica connections before their file is replaced
+    replica.dispose()
+    source = sqlite3.connect(primary.url.database)
+    target = sqlite3.connect(replica.url.database)
+    source.backup(target)
+    source.close()
+    target.close()
+    print(f'Copied {primary.url.database} to {replica.url.database}')
+
+# Request profiling
+SERVER_TIMING_NAMES = (('db', 'SQL'), ('tpl', 'Templates'), ('hash', 'Password hashing'))
+
+def record_timing(name, seconds):
+    """Add to a timer of the current request; a no-op unless the request is being timed"""
+    if has_request_context() and 'timings' in g:
+        g.timings[name] = g.timings.get(name, 0) + seconds
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is not None:
+        record_timing('db', time.perf_counter() - started)
+
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    if 'timings' in g:
+        g.template_started = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def stop_template_timer(sender, template, context, **extra):
+    started = g.pop('template_started', None)
+    if started is not None:
+        record_timing('tpl', time.perf_counter() - started)
+
+@app.before_request
+def start_request_timer():
+    if not app.config['PROFILE_REQUESTS']:
+        return
+    g.timings = {}
+    g.request_started = time.perf_counter()
+    g.request_queries = g.get('query_count', 0)
+    if random.random() < app.config['PROFILE_SAMPLE_RATE']:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already running in this thread
+            return
+        g.profiler = profiler
+
+@app.after_request
+def report_request_timings(response):
+    timings = g.pop('timings', None)
+    if timings is None:
+        return response
+    profiler = g.pop('profiler', None)
+    if profiler:
+        profiler.disable()
+    total_ms = (time.perf_counter() - g.request_started) * 1000
+    queries = g.get('query_count', 0) - g.request_queries
+    
+    metrics = [f'app;dur={total_ms:.1f};desc="Total"']
+    for name, description in SERVER_TIMING_NAMES:
+        if name in timings:
+            if name == 'db':
+                description = f'{queries} queries'
+            metrics.append(f'{name};dur={timings[name] * 1000:.1f};desc="{description}"')
+    response.headers['Server-Timing'] = ', '.join(metrics)
+    
+    if total_ms >= app.config['SLOW_REQUEST_MS']:
+        record = {
+            'endpoint': request.endpoint, 'method': request.method, 'path': request.path,
+            'status': response.status_code, 'total_ms': round(total_ms, 1), 'queries': queries,
+            **{f'{name}_ms': round(timings.get(name, 0) * 1000, 1) for name, _ in SERVER_TIMING_NAMES}
+        }
+        if profiler:
+            os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+            record['profile'] = os.path.join(
+                app.config['PROFILE_DIR'],
+                f'{datetime.utcnow():%Y%m%dT%H%M%S}-{request.endpoint}-{uuid.uuid4().hex[:6]}.prof'
+            )
+            profiler.dump_stats(record['profile'])
+        app.logger.warning('Slow request %s', json.dumps(record))
+    return response
+
+@app.teardown_request
+def stop_request_profiler(exc):
+    # after_request is skipped when the view raises
+    profiler = g.pop('profiler', None)
+    if profiler:
+        profiler.disable()
+    g.pop('timings', None)
+
+# Metrics
+METRIC_TYPES = {
+    'cms_http_requests_total': ('counter', 'Requests handled, by endpoint, method and status'),
+    'cms_http_request_duration_seconds': ('histogram', 'Request handling time by endpoint'),
+    'cms_db_pool_checkout_wait_seconds': ('histogram', 'Time spent waiting for a pooled database connection'),
+    'cms_db_pool_size': ('gauge', 'Configured connection pool size, summed over live workers'),
+    'cms_db_pool_checked_out': ('gauge', 'Connections in use, summed over live workers'),
+    'cms_db_pool_overflow': ('gauge', 'Connections opened beyond the pool size, summed over live workers'),
+    'cms_upload_bytes_total': ('counter', 'Bytes of media stored through uploads'),
+    'cms_uploads_total': ('counter', 'Media uploads stored'),
+    'cms_mail_messages_total': ('counter', 'Outbox send attempts by outcome'),
+    'cms_cache_hits_total': ('counter', 'Cache hits by cache'),
+    'cms_cache_misses_total': ('counter', 'Cache misses by cache'),
+}
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Metrics:
+    """Per-process counters and histograms, summed across workers at scrape time.
+
+    Recording only updates a dict under a lock. Each process writes a snapshot
+    to METRICS_DIR/<pid>.json at most every flush interval and whenever it
+    serves a scrape; the scrape merges every file. Gauges from processes that
+    have exited are dropped, their counters are kept.
+    """
+
+    def __init__(self, directory, flush_interval):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.collectors = []
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._last_flush = 0
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(HISTOGRAM_BUCKETS, value)
+        with self._lock:
+            # One count per bucket plus +Inf, then the running sum
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(HISTOGRAM_BUCKETS) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def collector(self, func):
+        """Register a function returning (kind, name, labels, value) samples read at flush time"""
+        self.collectors.append(func)
+        return func
+
+    def snapshot(self):
+        with self._lock:
+            counters = [[name, dict(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [[name, dict(labels), list(values)] for (name, labels), values in self._histograms.items()]
+        gauges = []
+        for func in self.collectors:
+            for kind, name, labels, value in func():
+                (counters if kind == 'counter' else gauges).append([name, labels, value])
+        return {'pid': os.getpid(), 'counters': counters, 'histograms': histograms, 'gauges': gauges}
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f'{path}.tmp', path)
+
+    def collect(self):
+        """Merge the snapshots of every worker into {name: {labels: value}}"""
+        self.flush(force=True)
+        merged = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            sections = ['counters', 'histograms']
+            if process_alive(snapshot['pid']):
+                sections.append('gauges')
+            for section in sections:
+                for name, labels, value in snapshot[section]:
+                    key = tuple(sorted(labels.items()))
+                    series = merged.setdefault(name, {})
+                    if section == 'histograms':
+                        current = series.get(key, [0] * len(value))
+                        series[key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        series[key] = series.get(key, 0) + value
+        return merged
+
+    def render(self):
+        lines = []
+        for name, series in sorted(self.collect().items()):
+            kind, description = METRIC_TYPES.get(name, ('untyped', name))
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key, value in sorted(series.items()):
+                labels = dict(key)
+                if kind != 'histogram':
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(HISTOGRAM_BUCKETS + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{format_labels(dict(labels, le=str(bound)))} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {value[-1]}')
+                lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in sorted(labels.items())
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+metrics = Metrics(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+
+@metrics.collector
+def pool_metrics():
+    if not has_app_context():
+        return
+    pool = db.engine.pool
+    if isinstance(pool, QueuePool):
+        yield 'gauge', 'cms_db_pool_size', {}, pool.size()
+        yield 'gauge', 'cms_db_pool_checked_out', {}, pool.checkedout()
+        yield 'gauge', 'cms_db_pool_overflow', {}, max(pool.overflow(), 0)
+
+@app.before_request
+def start_metrics_timer():
+    g.metrics_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        metrics.inc('cms_http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+        metrics.observe('cms_http_request_duration_seconds', time.perf_counter() - started, endpoint=endpoint)
+        metrics.flush()
+    return response
+
+# Cross-process version stamps
+class VersionStamp:
+    """Small file in the instance folder whose contents change on every bump.
+
+    In-process caches compare it on read so that a write in one worker
+    process invalidates the copies held by every other worker.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return f.read()
+        except FileNotFoundError:
+            return ''
+
+    def bump(self):
+        version = uuid.uuid4().hex
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, self.path)
+        return version
+
+os.makedirs(app.instance_path, exist_ok=True)
+
+# Settings cache
+SiteSettings = namedtuple('SiteSettings', [column.name for column in Settings.__table__.columns])
+
+class SettingsCache:
+    """Immutable snapshot of the Settings row, reloaded when the version stamp changes"""
+
+    def __init__(self, stamp):
+        self.stamp = stamp
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        version = self.stamp.read()
+        snapshot = self._snapshot
+        if snapshot is not None and version == self._version:
+            self.hits += 1
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or version != self._version:
+                self.misses += 1
+                self._snapshot = self.load()
+                self._version = version
+            return self._snapshot
+
+    def load(self):
+        with on_primary():
+            settings = Settings.query.first()
+        values = {}
+        for column in Settings.__table__.columns:
+            if settings is not None:
+                values[column.name] = getattr(settings, column.name)
+            elif column.default is not None and column.default.is_scalar:
+                values[column.name] = column.default.arg
+            else:
+                values[column.name] = None
+        return SiteSettings(**values)
+
+    def invalidate(self):
+        """Bump the version stamp; call after the settings change has been committed"""
+        self.stamp.bump()
+        self._snapshot = None
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+settings_cache = SettingsCache(VersionStamp(os.path.join(app.instance_path, 'settings.version')))
+
+# User cache
+class UserCache:
+    """Bounded LRU of user column values with a TTL, used by load_user.
+
+    A bump of the shared version stamp empties the cache in every worker, so
+    role changes and deletions apply on the next request everywhere. get
+    returns the version alongside the values, and put skips values read
+    before an invalidation that has happened since.
+    """
+
+    def __init__(self, stamp, maxsize, ttl):
+        self.stamp = stamp
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        version = self.stamp.read()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None, version
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1], version
+
+    def put(self, user_id, values, version):
+        with self._lock:
+            # The row was read before a change that has been committed since
+            if version != self._version:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drop a user here and in other workers; call after the change has been committed"""
+        version = self.stamp.bump()
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._version = version
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+user_cache = UserCache(
+    VersionStamp(os.path.join(app.instance_path, 'users.version')),
+    app.config['USER_CACHE_SIZE'],
+    app.config['USER_CACHE_TTL']
+)
+
+# Public page cache
+CachedPage = namedtuple('CachedPage', ['body', 'etag'])
+
+class PageCache:
+    """Bounded LRU of rendered public pages.
+
+    Entries are valid until the page stamp or the settings stamp changes, so a
+    hit is answered without touching the database. Post and category writes
+    bump the page stamp after they commit. get returns the version alongside
+    the page; put only stores a page rendered at the version still current.
+    """
+
+    def __init__(self, stamp, settings_stamp, maxsize):
+        self.stamp = stamp
+        self.settings_stamp = settings_stamp
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        version = (self.stamp.read(), self.settings_stamp.read())
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            page = self._entries.get(key)
+            if page is None:
+                self.misses += 1
+                return None, version
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return page, version
+
+    def put(self, key, body, version):
+        """Cache a page rendered after get returned version; it is only served if nothing changed since"""
+        page = CachedPage(body, hashlib.sha256(body).hexdigest()[:32])
+        with self._lock:
+            # A write committed during the render invalidated the rows it read
+            if version != self._version:
+                return page
+            self._entries[key] = page
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return page
+
+    def invalidate(self):
+        """Drop every page here and in other workers; call after the change has been committed"""
+        self.stamp.bump()
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+page_cache = PageCache(
+    VersionStamp(os.path.join(app.instance_path, 'pages.version')),
+    settings_cache.stamp,
+    app.config['PAGE_CACHE_SIZE']
+)
+
+@metrics.collector
+def cache_metrics():
+    for name, cache in (('user', user_cache), ('settings', settings_cache), ('page', page_cache)):
+        yield 'counter', 'cms_cache_hits_total', {'cache': name}, cache.hits
+        yield 'counter', 'cms_cache_misses_total', {'cache': name}, cache.misses
+
+def page_response(page):
+    """Response for a cached page that answers If-None-Match.
+
+    No Last-Modified: the body also depends on authors, categories and
+    settings, so no post timestamp dates it reliably. The ETag hashes the body.
+    """
+    response = app.response_class(page.body, mimetype='text/html')
+    response.set_etag(page.etag)
+    # Shared caches may store the page but must revalidate before reuse
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# Dashboard statistics
+POST_STATUS_STATS = {'published': 'posts_published', 'draft': 'posts_draft'}
+
+def bump_stats(**deltas):
+    """Adjust counters in the current transaction; they commit or roll back with the change"""
+    values = {name: getattr(SiteStats, name) + delta for name, delta in deltas.items() if delta}
+    if values:
+        db.session.execute(
+            db.update(SiteStats).values(**values).execution_options(synchronize_session=False)
+        )
+
+def bump_post_stats(status, delta):
+    deltas = {'posts': delta}
+    if status in POST_STATUS_STATS:
+        deltas[POST_STATUS_STATS[status]] = delta
+    bump_stats(**deltas)
+
+def move_post_stats(old_status, new_status):
+    if old_status == new_status:
+        return
+    deltas = {}
+    if old_status in POST_STATUS_STATS:
+        deltas[POST_STATUS_STATS[old_status]] = -1
+    if new_status in POST_STATUS_STATS:
+        deltas[POST_STATUS_STATS[new_status]] = 1
+    bump_stats(**deltas)
+
+def reconcile_stats():
+    """Rebuild the counters from the source tables"""
+    stats = SiteStats.query.first()
+    if not stats:
+        stats = SiteStats()
+        db.session.add(stats)
+    status_counts = dict(db.session.query(Post.status, func.count(Post.id)).group_by(Post.status).all())
+    stats.posts = sum(status_counts.values())
+    for status, column in POST_STATUS_STATS.items():
+        setattr(stats, column, status_counts.get(status, 0))
+    stats.categories = Category.query.count()
+    stats.users = User.query.count()
+    stats.media = Media.query.count()
+    db.session.commit()
+    return stats
+
+def get_stats():
+    stats = SiteStats.query.first()
+    if stats is None:
+        # The counts are written to the primary, so take them from there, not from a lagging replica
+        with on_primary():
+            stats = reconcile_stats()
+    return stats
+
+@app.cli.command('reconcile-stats')
+def reconcile_stats_command():
+    """Rebuild the dashboard counters from scratch."""
+    stats = reconcile_stats()
+    print(f'Stats reconciled: {stats.posts} posts ({stats.posts_published} published, '
+          f'{stats.posts_draft} draft), {stats.categories} categories, '
+          f'{stats.users} users, {stats.media} media')
+
+@app.cli.command('bench-password')
+@click.argument('methods', nargs=-1)
+@click.option('--rounds', default=20, help='Verifications per method.')
+def bench_password_command(methods, rounds):
+    """Report password verifications per second for each hash method."""
+    methods = methods or (
+        app.config['PASSWORD_HASH_METHOD'],
+        'pbkdf2:sha256:600000',
+        'pbkdf2:sha256:260000',
+        'pbkdf2:sha256:100000',
+        'scrypt:32768:8:1',
+        'scrypt:16384:8:1',
+    )
+    for method in dict.fromkeys(methods):
+        pwhash = generate_password_hash('benchmark-password', method)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            check_password_hash(pwhash, 'benchmark-password')
+        elapsed = time.perf_counter() - start
+        print(f'{method:<28} {rounds / elapsed:10.1f} verifications/s  {elapsed / rounds * 1000:8.1f} ms each')
+
+# Media storage
+def blob_path(checksum, extension):
+    return f'{checksum[:2]}/{checksum}{extension}'
+
+BLOB_UPSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+def acquire_blob(checksum, extension, store):
+    """Take a reference on the blob for checksum, calling store(path) to write it if it is new"""
+    result = db.session.execute(
+        db.update(MediaBlob)
+        .where(MediaBlob.checksum == checksum)
+        .values(ref_count=MediaBlob.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        path = db.session.execute(db.select(MediaBlob.path).where(MediaBlob.checksum == checksum)).scalar_one()
+        full_path = os.path.join(app.config['UPLOAD_FOLDER'], path)
+        if not os.path.exists(full_path):
+            # A delete removed the file but failed to commit dropping the unreferenced row
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            store(full_path)
+        return path
+    
+    path = blob_path(checksum, extension)
+    full_path = os.path.join(app.config['UPLOAD_FOLDER'], path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    store(full_path)
+    # A concurrent first upload of the same bytes may insert the row first; then this one takes a reference
+    values = {'checksum': checksum, 'path': path, 'size': os.path.getsize(full_path), 'ref_count': 1}
+    upsert = BLOB_UPSERTS.get(db.engine.dialect.name)
+    if upsert:
+        db.session.execute(
+            upsert(MediaBlob).values(**values)
+            .on_conflict_do_update(index_elements=[MediaBlob.checksum], set_={'ref_count': MediaBlob.ref_count + 1})
+        )
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(MediaBlob).values(**values))
+        except IntegrityError:
+            db.session.execute(
+                db.update(MediaBlob).where(MediaBlob.checksum == checksum)
+                .values(ref_count=MediaBlob.ref_count + 1).execution_options(synchronize_session=False)
+            )
+    stored_path = db.session.execute(db.select(MediaBlob.path).where(MediaBlob.checksum == checksum)).scalar_one()
+    if stored_path != path:
+        # The other upload used a different extension; keep its file
+        remove_upload(path)
+    return stored_path
+
+def release_blob(media):
+    """Drop media's reference; returns (path, shared) for the file to remove, or (None, True).
+
+    A shared blob that lost its last reference is removed by collect_blob after the commit. Media
+    stored under its own name before blob storage has no blob, and its own file can simply go.
+    """
+    checksum = media.checksum
+    result = db.session.execute(
+        db.update(MediaBlob)
+        .where(MediaBlob.checksum == checksum)
+        .values(ref_count=MediaBlob.ref_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        return media.filename, False
+    return db.session.execute(
+        db.select(MediaBlob.path).where(MediaBlob.checksum == checksum, MediaBlob.ref_count <= 0)
+    ).scalar_one_or_none(), True
+
+def collect_blob(checksum, path):
+    """Remove an unreferenced blob row with its file and variants; call after the release has committed.
+
+    The DELETE locks the row (on SQLite, the database) until the files are gone and it commits, so
+    an upload of the same bytes either took its reference first and the blob stays, or waits and
+    then stores the file afresh.
+    """
+    result = db.session.execute(
+        db.delete(MediaBlob)
+        .where(MediaBlob.checksum == checksum, MediaBlob.path == path, MediaBlob.ref_count <= 0)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        remove_upload(path)
+        remove_variants(checksum)
+    db.session.commit()
+
+def remove_upload(path):
+    try:
+        os.remove(os.path.join(app.config['UPLOAD_FOLDER'], path))
+    except OSError:
+        pass  # Ignore if file doesn't exist
+
+@app.cli.command('dedupe-media')
+def dedupe_media_command():
+    """Move media stored under per-upload names into content-addressed blobs."""
+    moved = reclaimed = 0
+    legacy = (
+        Media.query
+        .outerjoin(MediaBlob, MediaBlob.checksum == Media.checksum)
+        .filter(MediaBlob.id.is_(None))
+        .order_by(Media.id)
+        .all()
+    )
+    for media in legacy:
+        old_path = os.path.join(app.config['UPLOAD_FOLDER'], media.filename)
+        if not os.path.exists(old_path):
+            print(f'Skipping media {media.id}: {media.filename} is missing')
+            continue
+        sha256 = hashlib.sha256()
+        with open(old_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        checksum = sha256.hexdigest()
+        extension = os.path.splitext(media.filename)[1].lower()
+        path = acquire_blob(checksum, extension, lambda full_path: os.replace(old_path, full_path))
+        if os.path.exists(old_path):
+            reclaimed += os.path.getsize(old_path)
+            os.remove(old_path)
+        media.filename = path
+        media.checksum = checksum
+        db.session.commit()
+        moved += 1
+    print(f'Moved {moved} media files into blob storage, reclaimed {reclaimed} bytes')
+
+# Image variants
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif'}
+
+def render_image_variants(source_path, upload_folder, checksum, widths, image_format, quality):
+    """Write a resized copy of an image for each width narrower than the original.
+
+    Runs in a worker process; returns the original size and
+    (width, height, path, file_size) for each variant.
+    """
+    extension = '.' + image_format.lower()
+    variants = []
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        original_width, original_height = image.size
+        has_alpha = image.mode in ('RGBA', 'LA', 'P') and image_format.upper() != 'JPEG'
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        for width in sorted(set(widths)):
+            if width >= original_width:
+                break
+            height = max(1, round(original_height * width / original_width))
+            path = f'variants/{checksum[:2]}/{checksum}-{width}{extension}'
+            full_path = os.path.join(upload_folder, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            tmp_path = f'{full_path}.{os.getpid()}.tmp'
+            image.resize((width, height), Image.LANCZOS).save(tmp_path, format=image_format, quality=quality)
+            os.replace(tmp_path, full_path)
+            variants.append((width, height, path, os.path.getsize(full_path)))
+    return (original_width, original_height), variants
+
+def is_variant_source(media):
+    return bool(media.checksum and media.file_type and media.file_type.startswith('image/')
+                and os.path.splitext(media.filename)[1].lower() in IMAGE_EXTENSIONS)
+
+def variant_job(media):
+    upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+    return (
+        os.path.join(upload_folder, media.filename),
+        upload_folder,
+        media.checksum,
+        app.config['IMAGE_VARIANT_WIDTHS'],
+        app.config['IMAGE_VARIANT_FORMAT'],
+        app.config['IMAGE_VARIANT_QUALITY'],
+    )
+
+def record_variants(media_ids, original_size, variants):
+    """Store generated variants against each Media row that shares the source image"""
+    for media in Media.query.filter(Media.id.in_(media_ids)).all():
+        media.width, media.height = original_size
+        media.variants = [
+            MediaVariant(width=width, height=height, path=path, file_size=file_size)
+            for width, height, path, file_size in variants
+        ]
+    db.session.commit()
+
+def remove_variants(checksum):
+    pattern = os.path.join(app.config['UPLOAD_FOLDER'], 'variants', checksum[:2], f'{checksum}-*')
+    for path in glob.glob(pattern):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class ImagePipeline:
+    """Process pool rendering image variants off the request path"""
+
+    def __init__(self, app):
+        self.app = app
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: never fork a process that is running the mail and hashing threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=max(1, self.app.config['IMAGE_WORKERS']),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def schedule(self, media):
+        if not is_variant_source(media):
+            return
+        # Identical bytes were already rendered for another upload: reuse its variants
+        sibling = Media.query.filter(
+            Media.checksum == media.checksum, Media.id != media.id, Media.width.isnot(None)
+        ).first()
+        if sibling:
+            record_variants([media.id], (sibling.width, sibling.height),
+                            [(v.width, v.height, v.path, v.file_size) for v in sibling.variants])
+            return
+        if self.app.config['IMAGE_WORKERS'] <= 0:
+            # The upload has already committed; an image Pillow cannot read just gets no variants
+            media_id = media.id
+            try:
+                record_variants([media_id], *render_image_variants(*variant_job(media)))
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception(f'Generating image variants for media {media_id} failed')
+            return
+        future = self.executor.submit(render_image_variants, *variant_job(media))
+        future.add_done_callback(lambda f, media_id=media.id: self._finish(media_id, f))
+
+    def _finish(self, media_id, future):
+        with self.app.app_context():
+            try:
+                record_variants([media_id], *future.result())
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception(f'Generating image variants for media {media_id} failed')
+            finally:
+                db.session.remove()
+
+image_pipeline = ImagePipeline(app)
+
+@app.template_filter('srcset')
+def srcset_filter(image):
+    """srcset for a Media row, or for an uploads URL such as Post.featured_image"""
+    if isinstance(image, Media):
+        candidates = [(variant.path, variant.width) for variant in image.variants]
+        if image.width:
+            candidates.append((image.filename, image.width))
+    else:
+        # Blob URLs carry the checksum, so variants can be found without a query
+        match = re.search(r'/(?:uploads|media)/[0-9a-f]{2}/([0-9a-f]{64})\.', image or '')
+        if not match:
+            return ''
+        checksum = match.group(1)
+        extension = '.' + app.config['IMAGE_VARIANT_FORMAT'].lower()
+        candidates = []
+        for width in app.config['IMAGE_VARIANT_WIDTHS']:
+            path = f'variants/{checksum[:2]}/{checksum}-{width}{extension}'
+            if os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], path)):
+                candidates.append((path, width))
+    return ', '.join(f"{url_for('serve_media', filename=path)} {width}w" for path, width in candidates)
+
+@app.cli.command('generate-variants')
+@click.option('--force', is_flag=True, help='Regenerate variants for images that already have them.')
+@click.option('--workers', default=0, help='Worker processes (default: one per CPU).')
+def generate_variants_command(force, workers):
+    """Generate image variants for the existing media library."""
+    query = Media.query.filter(Media.file_type.like('image/%'))
+    if not force:
+        query = query.filter(Media.width.is_(None))
+    
+    # Render each distinct image once, however many Media rows share it
+    by_checksum = {}
+    for media in query.order_by(Media.id).all():
+        if is_variant_source(media):
+            by_checksum.setdefault(media.checksum, []).append(media)
+        else:
+            print(f'Skipping media {media.id}: run flask dedupe-media first')
+    
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers or None, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {
+            executor.submit(render_image_variants, *variant_job(rows[0])): [media.id for media in rows]
+            for rows in by_checksum.values()
+        }
+        for future in futures:
+            try:
+                record_variants(futures[future], *future.result())
+                done += 1
+            except Exception as e:
+                db.session.rollback()
+                print(f'Failed for media {futures[future]}: {e}')
+    print(f'Generated variants for {done} of {len(by_checksum)} images')
+
+# Mail outbox
+def queue_mail(subject, recipients, body):
+    """Add a message to the outbox; it is sent once the current transaction commits"""
+    message = MailOutbox(subject=subject, recipients=','.join(recipients), body=body)
+    db.session.add(message)
+    return message
+
+def claim_outbox_batch(batch_size):
+    """Mark a batch of due messages as ours so that other workers skip them"""
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    stale = now - timedelta(seconds=app.config['MAIL_OUTBOX_LEASE'])
+    claimable = (
+        MailOutbox.status == 'pending',
+        MailOutbox.next_attempt_at <= now,
+        db.or_(MailOutbox.claim_token.is_(None), MailOutbox.claimed_at < stale)
+    )
+    # Under READ COMMITTED two workers can pick the same ids; SKIP LOCKED makes the second one
+    # pass over rows the first has locked (SQLite serializes writers and renders no FOR UPDATE),
+    # and repeating the lease condition in the UPDATE makes a row claimed in between fail the
+    # recheck Postgres runs after waiting on its lock
+    due_ids = (
+        db.select(MailOutbox.id)
+        .where(*claimable)
+        .order_by(MailOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        db.update(MailOutbox)
+        .where(MailOutbox.id.in_(due_ids), *claimable)
+        .values(claim_token=token, claimed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return MailOutbox.query.filter_by(claim_token=token, status='pending').order_by(MailOutbox.id).all()
+
+def drain_outbox():
+    """Send one batch of due messages over a single SMTP connection; returns the number sent"""
+    batch = claim_outbox_batch(app.config['MAIL_OUTBOX_BATCH_SIZE'])
+    if not batch:
+        return 0
+    
+    sent = 0
+    errors = {}
+    try:
+        with mail.connect() as conn:
+            for message in batch:
+                try:
+                    conn.send(Message(message.subject, recipients=message.recipients.split(','), body=message.body))
+                    message.status = 'sent'
+                    message.sent_at = datetime.utcnow()
+                    sent += 1
+                except Exception as e:
+                    errors[message.id] = e
+    except Exception as e:
+        # Connecting or closing failed: retry everything that was not sent
+        for message in batch:
+            if message.status != 'sent':
+                errors.setdefault(message.id, e)
+    
+    for message in batch:
+        message.claim_token = None
+        if message.id in errors:
+            message.attempts += 1
+            message.last_error = str(errors[message.id])
+            if message.attempts >= app.config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+                message.status = 'failed'
+            else:
+                delay = app.config['MAIL_OUTBOX_RETRY_DELAY'] * 2 ** (message.attempts - 1)
+                message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    db.session.commit()
+    
+    failed = sum(1 for message in batch if message.status == 'failed')
+    for outcome, count in (('sent', sent), ('retry', len(errors) - failed), ('failed', failed)):
+        if count:
+            metrics.inc('cms_mail_messages_total', count, outcome=outcome)
+    
+    if errors:
+        app.logger.warning(f'Mail outbox: {len(errors)} of {len(batch)} messages failed, will retry')
+    return sent
+
+class MailSender:
+    """Background thread draining the outbox, woken early whenever mail is queued"""
+
+    def __init__(self, app):
+        self.app = app
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the thread if it is not running; its first pass drains whatever is already due"""
+        if not self.app.config['MAIL_OUTBOX_BACKGROUND']:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='mail-sender', daemon=True)
+                self._thread.start()
+                self._wakeup.set()
+
+    def wake(self):
+        if not self.app.config['MAIL_OUTBOX_BACKGROUND']:
+            return
+        self.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.app.config['MAIL_OUTBOX_POLL_INTERVAL'])
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    # Keep going while full batches come back
+                    while drain_outbox() >= self.app.config['MAIL_OUTBOX_BATCH_SIZE']:
+                        pass
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Mail outbox drain failed')
+                finally:
+                    db.session.remove()
+
+mail_sender = MailSender(app)
+
+@app.before_request
+def start_mail_sender():
+    # Started by the first request rather than at import, so CLI commands and workers forked from a
+    # preloaded app don't run a sender; mail queued before a restart goes out without a new trigger
+    mail_sender.start()
+
+@app.cli.command('send-mail')
+@click.option('--loop', is_flag=True, help='Keep polling the outbox instead of exiting when it is empty.')
+def send_mail_command(loop):
+    """Send queued outbox mail."""
+    while True:
+        sent = drain_outbox()
+        if sent:
+            print(f'Sent {sent} messages')
+        elif not loop:
+            break
+        else:
+            time.sleep(app.config['MAIL_OUTBOX_POLL_INTERVAL'])
+
+# Category hierarchy
+CATEGORY_PATHS_SQL = (
+    "WITH RECURSIVE tree(id, path, depth) AS ("
+    "SELECT id, '/' || CAST(id AS VARCHAR(20)) || '/', 0 FROM category WHERE parent_id IS NULL "
+    "UNION ALL "
+    "SELECT category.id, tree.path || CAST(category.id AS VARCHAR(20)) || '/', tree.depth + 1 "
+    "FROM category JOIN tree ON category.parent_id = tree.id) "
+    "UPDATE category SET path = (SELECT path FROM tree WHERE tree.id = category.id), "
+    "depth = (SELECT depth FROM tree WHERE tree.id = category.id)"
+)
+
+def subtree_condition(path):
+    """Categories at or below the one with this path, as a condition the path index can serve"""
+    if db.engine.dialect.name == 'sqlite':
+        # SQLite compares text bytewise, and '0' sorts right after '/', so the range covers exactly
+        # the paths starting with this one; its LIKE is case-insensitive and would skip the index
+        return db.and_(Category.path >= path, Category.path < path[:-1] + '0')
+    # Elsewhere collations may ignore punctuation when ordering, so match the prefix instead
+    # (paths hold only digits and '/', nothing LIKE treats specially)
+    return Category.path.like(path + '%')
+
+def move_subtree(old_path, new_path, depth_change):
+    """Rewrite the paths below old_path to start with new_path in one UPDATE"""
+    db.session.execute(
+        db.update(Category)
+        .where(subtree_condition(old_path))
+        .values(
+            path=db.literal(new_path, db.String) + func.substr(Category.path, len(old_path) + 1, type_=db.String),
+            depth=Category.depth + depth_change
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+def ensure_category_paths():
+    """Index categories written without a path (raw inserts, an unfinished import) before relying on paths"""
+    if db.session.query(Category.id).filter(Category.path.is_(None)).first() is not None:
+        rebuild_category_paths()
+
+def set_category_parent(category, parent):
+    """Place a flushed category under parent (None for a root); False if that would make a cycle"""
+    # A category without a path is one just added (ensure_category_paths indexes the rest), so it has no subtree
+    if parent is not None and category.path and parent.path.startswith(category.path):
+        return False
+    new_path = f"{parent.path if parent else '/'}{category.id}/"
+    new_depth = parent.depth + 1 if parent else 0
+    category.parent_id = parent.id if parent else None
+    if category.path and category.path != new_path:
+        move_subtree(category.path, new_path, new_depth - category.depth)
+    category.path = new_path
+    category.depth = new_depth
+    return True
+
+def detach_category(category):
+    """Hand a category's children (and their subtrees) to its parent before it is deleted"""
+    parent_path = category.path[:-len(f'{category.id}/')]
+    db.session.execute(
+        db.update(Category).where(Category.parent_id == category.id)
+        .values(parent_id=category.parent_id).execution_options(synchronize_session=False)
+    )
+    # Everything strictly below the category moves up one level
+    move_subtree(category.path, parent_path, -1)
+
+def category_ancestors(category):
+    """The categories above this one, root first, in one query"""
+    ids = [int(part) for part in category.path.strip('/').split('/')[:-1]] if category.path else []
+    if not ids:
+        return []
+    return Category.query.filter(Category.id.in_(ids)).order_by(Category.depth).all()
+
+def category_tree(categories):
+    """Order categories depth-first, siblings by name"""
+    ids = {category.id for category in categories}
+    children = {}
+    for category in categories:
+        parent_id = category.parent_id if category.parent_id in ids else None
+        children.setdefault(parent_id, []).append(category)
+    ordered = []
+    stack = sorted(children.get(None, []), key=lambda category: category.name.lower(), reverse=True)
+    while stack:
+        category = stack.pop()
+        ordered.append(category)
+        stack.extend(sorted(children.get(category.id, []), key=lambda child: child.name.lower(), reverse=True))
+    return ordered
+
+def rebuild_category_paths():
+    """Recompute every path and depth from parent_id, repairing rows the roots do not reach"""
+    while True:
+        db.session.execute(text(CATEGORY_PATHS_SQL))
+        unreached = db.session.query(func.min(Category.id)).filter(Category.path.is_(None)).scalar()
+        if unreached is None:
+            break
+        # Categories under a missing parent become roots; a cycle is broken at its lowest id
+        parents = db.select(Category.id).scalar_subquery()
+        db.session.execute(
+            db.update(Category)
+            .where(Category.path.is_(None), db.or_(Category.id == unreached, Category.parent_id.not_in(parents)))
+            .values(parent_id=None)
+            .execution_options(synchronize_session=False)
+        )
+
+CATEGORY_RETAG_MODES = ('copy', 'move', 'merge')
+
+def retag_category(source, target, mode):
+    """Copy or move every post link from source to target with set-based statements.
+
+    A merge also hands source's subcategories to target and deletes source.
+    Returns the number of posts newly linked to target.
+    """
+    linked = post_categories.alias('linked')
+    added = db.session.execute(post_categories.insert().from_select(
+        ['post_id', 'category_id'],
+        db.select(post_categories.c.post_id, db.literal(target.id)).where(
+            post_categories.c.category_id == source.id,
+            ~db.exists().where(linked.c.post_id == post_categories.c.post_id, linked.c.category_id == target.id)
+        )
+    )).rowcount
+    if mode in ('move', 'merge'):
+        db.session.execute(post_categories.delete().where(post_categories.c.category_id == source.id))
+    if mode == 'merge':
+        db.session.execute(
+            db.update(Category).where(Category.parent_id == source.id)
+            .values(parent_id=target.id).execution_options(synchronize_session=False)
+        )
+        move_subtree(source.path, target.path, target.depth - source.depth)
+        db.session.delete(source)
+        bump_stats(categories=-1)
+    return added
+
+def resolve_categories(category_ids):
+    """Load the submitted categories in one query, skipping unknown ids"""
+    ids = {int(category_id) for category_id in category_ids if str(category_id).isdigit()}
+    return Category.query.filter(Category.id.in_(ids)).all() if ids else []
+
+def sync_post_categories(post, categories):
+    """Link and unlink only the categories that changed"""
+    wanted = {category.id for category in categories}
+    current = post.categories
+    for category in [category for category in current if category.id not in wanted]:
+        current.remove(category)
+    kept = {category.id for category in current}
+    current.extend(category for category in categories if category.id not in kept)
+
+@app.cli.command('rebuild-category-paths')
+def rebuild_category_paths_command():
+    """Recompute the category hierarchy index from parent_id."""
+    rebuild_category_paths()
+    db.session.commit()
+    page_cache.invalidate()
+    print('Category paths rebuilt')
+
+# Full-text search
+def html_to_text(value):
+    """Plain text of an HTML fragment, for indexing and snippets"""
+    value = re.sub(r'<(script|style)\b.*?</\1>', ' ', value or '', flags=re.S | re.I)
+    return ' '.join(html.unescape(re.sub(r'<[^>]+>', ' ', value)).split())
+
+def search_terms(query_text):
+    return re.findall(r'\w+', query_text or '')
+
+def highlight_snippet(snippet):
+    """Escape a snippet and turn the \\x02/\\x03 match markers into <mark> tags"""
+    return Markup(str(escape(snippet or '')).replace('\x02', '<mark>').replace('\x03', '</mark>'))
+
+SearchHit = namedtuple('SearchHit', ['post_id', 'rank', 'snippet'])
+
+class SearchBackend(ABC):
+    """Ranked full-text search over post title, excerpt and content.
+
+    Backends without an index of their own can leave the index hooks as no-ops.
+    """
+
+    def create(self, connection):
+        """Create the index structures if they do not exist"""
+
+    def index_posts(self, connection, posts):
+        """Update the index for posts (anything with id, title, excerpt and content attributes)"""
+
+    def remove_posts(self, connection, post_ids):
+        """Drop posts from the index"""
+
+    def rebuild(self, connection):
+        """Re-index every post"""
+
+    @abstractmethod
+    def search(self, query_text, status=None, limit=10, offset=0):
+        """Return SearchHit rows, best match first"""
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 table holding the plain text of each post, keyed by post id"""
+
+    def create(self, connection):
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5("
+            "title, excerpt, body, tokenize='unicode61 remove_diacritics 2')"
+        ))
+
+    def index_posts(self, connection, posts):
+        posts = list(posts)
+        if posts:
+            self.remove_posts(connection, [post.id for post in posts])
+            self._insert(connection, posts)
+
+    def _insert(self, connection, posts):
+        connection.execute(
+            text('INSERT INTO post_fts (rowid, title, excerpt, body) VALUES (:id, :title, :excerpt, :body)'),
+            [{'id': post.id, 'title': post.title or '', 'excerpt': html_to_text(post.excerpt),
+              'body': html_to_text(post.content)} for post in posts]
+        )
+
+    def remove_posts(self, connection, post_ids):
+        connection.execute(
+            text('DELETE FROM post_fts WHERE rowid IN :ids').bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(post_ids)}
+        )
+
+    def rebuild(self, connection):
+        connection.execute(text('DELETE FROM post_fts'))
+        result = connection.execution_options(yield_per=1000).execute(text('SELECT id, title, excerpt, content FROM post'))
+        for posts in result.partitions():
+            self._insert(connection, posts)
+
+    def search(self, query_text, status=None, limit=10, offset=0):
+        terms = search_terms(query_text)
+        if not terms:
+            return []
+        # Every term must match; the last one also matches as a prefix while typing
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        sql = (
+            "SELECT post_fts.rowid AS post_id, bm25(post_fts, 10.0, 4.0, 1.0) AS rank, "
+            "snippet(post_fts, -1, char(2), char(3), '…', 16) AS snippet "
+            "FROM post_fts JOIN post ON post.id = post_fts.rowid "
+            "WHERE post_fts MATCH :match"
+        )
+        params = {'match': match, 'limit': limit, 'offset': offset}
+        if status:
+            sql += ' AND post.status = :status'
+            params['status'] = status
+        sql += ' ORDER BY rank LIMIT :limit OFFSET :offset'
+        return [SearchHit(*row) for row in db.session.execute(text(sql), params)]
+
+class PostgresSearchBackend(SearchBackend):
+    """tsvector expression over the post columns with a GIN index; no separate table to sync"""
+
+    DOCUMENT = (
+        "setweight(to_tsvector('simple', coalesce(post.title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(post.excerpt, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(post.content, '')), 'C')"
+    )
+
+    def create(self, connection):
+        connection.execute(text(f'CREATE INDEX IF NOT EXISTS ix_post_search ON post USING GIN (({self.DOCUMENT}))'))
+
+    def search(self, query_text, status=None, limit=10, offset=0):
+        terms = search_terms(query_text)
+        if not terms:
+            return []
+        sql = (
+            f"SELECT post.id AS post_id, ts_rank({self.DOCUMENT}, query) AS rank, "
+            "ts_headline('simple', coalesce(post.content, ''), query, "
+            "'StartSel=' || chr(2) || ', StopSel=' || chr(3) || ', MaxWords=30, MinWords=10') AS snippet "
+            "FROM post, to_tsquery('simple', :query) AS query "
+            f"WHERE {self.DOCUMENT} @@ query"
+        )
+        params = {'query': ' & '.join(terms) + ':*', 'limit': limit, 'offset': offset}
+        if status:
+            sql += ' AND post.status = :status'
+            params['status'] = status
+        sql += ' ORDER BY rank DESC LIMIT :limit OFFSET :offset'
+        return [SearchHit(*row) for row in db.session.execute(text(sql), params)]
+
+class LikeSearchBackend(SearchBackend):
+    """Fallback for other databases: every term matched with LIKE, newest first, no index"""
+
+    def search(self, query_text, status=None, limit=10, offset=0):
+        terms = search_terms(query_text)
+        if not terms:
+            return []
+        query = db.select(Post.id, Post.title, Post.excerpt)
+        for term in terms:
+            query = query.where(db.or_(
+                Post.title.icontains(term, autoescape=True),
+                Post.excerpt.icontains(term, autoescape=True),
+                Post.content.icontains(term, autoescape=True)
+            ))
+        if status:
+            query = query.where(Post.status == status)
+        query = query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit).offset(offset)
+        pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+        return [
+            SearchHit(row.id, 0, pattern.sub(lambda match: f'\x02{match.group()}\x03', html_to_text(row.excerpt) or row.title))
+            for row in db.session.execute(query)
+        ]
+
+SEARCH_BACKENDS = {'sqlite': SQLiteSearchBackend, 'postgresql': PostgresSearchBackend}
+
+def search_backend_for(dialect_name):
+    return SEARCH_BACKENDS.get(dialect_name, LikeSearchBackend)()
+
+@event.listens_for(db.metadata, 'after_create')
+def create_search_index(target, connection, **kw):
+    search_backend_for(connection.dialect.name).create(connection)
+
+@event.listens_for(Post, 'after_insert')
+def index_new_post(mapper, connection, post):
+    search_backend_for(connection.dialect.name).index_posts(connection, [post])
+
+@event.listens_for(Post, 'after_update')
+def reindex_post(mapper, connection, post):
+    state = sa_inspect(post)
+    if any(state.attrs[name].history.has_changes() for name in ('title', 'excerpt', 'content')):
+        search_backend_for(connection.dialect.name).index_posts(connection, [post])
+
+@event.listens_for(Post, 'after_delete')
+def unindex_post(mapper, connection, post):
+    search_backend_for(connection.dialect.name).remove_posts(connection, [post.id])
+
+def search_posts(query_text, status=None, page=1, per_page=10):
+    """One page of ranked search results as (posts with .snippet set, has_more)"""
+    backend = search_backend_for(db.engine.dialect.name)
+    hits = backend.search(query_text, status, limit=per_page + 1, offset=(page - 1) * per_page)
+    has_more = len(hits) > per_page
+    hits = hits[:per_page]
+    posts = {
+        post.id: post for post in
+        Post.query.options(joinedload(Post.author), selectinload(Post.categories))
+        .filter(Post.id.in_([hit.post_id for hit in hits])).all()
+    }
+    results = []
+    for hit in hits:
+        post = posts.get(hit.post_id)
+        if post:
+            post.snippet = highlight_snippet(hit.snippet)
+            results.append(post)
+    return results, has_more
+
+@app.cli.command('reindex-search')
+def reindex_search_command():
+    """Rebuild the full-text search index for all posts."""
+    with db.engine.begin() as connection:
+        backend = search_backend_for(connection.dialect.name)
+        backend.create(connection)
+        backend.rebuild(connection)
+    print('Search index rebuilt')
+
+# Post rendering
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'div', 'em', 'figcaption', 'figure', 'h1', 'h2', 'h3',
+    'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'span', 'strong', 'sub', 'sup',
+    'table', 'tbody', 'td', 'th', 'thead', 'tr', 'u', 'ul'
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'abbr': {'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height', 'srcset', 'sizes'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_URL_SCHEMES = {'http', 'https', 'mailto'}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Elements dropped together with everything inside them
+DROPPED_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'svg', 'math'}
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+
+def is_safe_url(value):
+    # Browsers drop tabs and newlines inside URLs, so 'java\tscript:' would run as 'javascript:';
+    # real links never contain control characters (or the U+FFFD that &#0; decodes to)
+    value = value.strip()
+    if re.search('[\x00-\x1f\x7f\ufffd]', value):
+        return False
+    try:
+        scheme = urlsplit(value).scheme
+    except ValueError:
+        return False
+    return not scheme or scheme.lower() in ALLOWED_URL_SCHEMES
+
+class HTMLSanitizer(HTMLParser):
+    """Re-serializes HTML keeping only allowlisted tags and attributes"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        parts = [tag]
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not is_safe_url(value):
+                continue
+            parts.append(f'{name}="{html.escape(value)}"')
+        if tag == 'a':
+            parts.append('rel="nofollow noopener"')
+        self.out.append(f"<{' '.join(parts)}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            return
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # Close anything left open inside this element first
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.out.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.out.append(html.escape(data, quote=False))
+
+    def result(self):
+        self.close()
+        return ''.join(self.out) + ''.join(f'</{tag}>' for tag in reversed(self.open_tags))
+
+def sanitize_html(value):
+    sanitizer = HTMLSanitizer()
+    sanitizer.feed(value or '')
+    return sanitizer.result()
+
+def make_excerpt(plain_text, length=EXCERPT_LENGTH):
+    if len(plain_text) <= length:
+        return plain_text
+    return plain_text[:length].rsplit(' ', 1)[0].rstrip(',.;:') + '…'
+
+def render_post_content(content):
+    """Sanitized HTML, excerpt and reading stats for post content.
+
+    A plain function of the content so that the backfill can run it in worker processes.
+    """
+    content_html = sanitize_html(content)
+    plain_text = html_to_text(content_html)
+    word_count = len(plain_text.split())
+    return {
+        'content_html': content_html,
+        'excerpt': make_excerpt(plain_text),
+        'word_count': word_count,
+        'reading_time': max(1, -(-word_count // WORDS_PER_MINUTE)) if word_count else 0,
+    }
+
+@event.listens_for(Post, 'before_insert')
+@event.listens_for(Post, 'before_update')
+def render_post(mapper, connection, post):
+    state = sa_inspect(post)
+    if post.content_html is not None and not state.attrs.content.history.has_changes():
+        return
+    rendered = render_post_content(post.content)
+    # An excerpt written by hand in the same save wins over the generated one
+    if state.attrs.excerpt.history.has_changes() and post.excerpt:
+        rendered.pop('excerpt')
+    for name, value in rendered.items():
+        setattr(post, name, value)
+
+@app.template_filter('sanitize_html')
+def sanitize_html_filter(value):
+    return Markup(sanitize_html(value))
+
+@app.cli.command('render-posts')
+@click.option('--force', is_flag=True, help='Re-render posts that have already been rendered.')
+@click.option('--batch-size', default=500, show_default=True, help='Posts read and written per batch.')
+@click.option('--workers', default=0, help='Worker processes (default: one per CPU).')
+def render_posts_command(force, batch_size, workers):
+    """Fill sanitized HTML, excerpts and reading stats for existing posts."""
+    query = db.select(Post.id, Post.content, Post.updated_at).order_by(Post.id)
+    if not force:
+        query = query.where(Post.content_html.is_(None))
+    
+    done = 0
+    last_id = 0
+    with ProcessPoolExecutor(max_workers=workers or None, mp_context=multiprocessing.get_context('spawn')) as executor:
+        while True:
+            rows = db.session.execute(query.where(Post.id > last_id).limit(batch_size)).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            rendered = executor.map(render_post_content, [row.content for row in rows], chunksize=16)
+            # Bulk UPDATE by primary key; updated_at is kept since the content did not change
+            db.session.execute(db.update(Post), [
+                dict(values, id=row.id, updated_at=row.updated_at) for row, values in zip(rows, rendered)
+            ])
+            db.session.commit()
+            done += len(rows)
+            print(f'Rendered {done} posts')
+    
+    # Bulk updates skip the mapper events, so refresh what depends on excerpts and pages here
+    with db.engine.begin() as connection:
+        search_backend_for(connection.dialect.name).rebuild(connection)
+    page_cache.invalidate()
+    print(f'Rendered {done} posts in total')
+
+# Content import/export
+EXPORT_BATCH_SIZE = 1000
+
+def isoformat(value):
+    return value.isoformat() if value else None
+
+def parse_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+def export_records():
+    """Yield every category, then every post with its category slugs, reading in keyset batches"""
+    parent = aliased(Category)
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Category.id, Category.slug, Category.name, Category.description, Category.created_at,
+                      parent.slug.label('parent'))
+            .outerjoin(parent, parent.id == Category.parent_id)
+            .where(Category.id > last_id)
+            .order_by(Category.id)
+            .limit(EXPORT_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        for row in rows:
+            yield {'type': 'category', 'slug': row.slug, 'name': row.name, 'description': row.description,
+                   'parent': row.parent, 'created_at': isoformat(row.created_at)}
+    
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Post.id, Post.slug, Post.title, Post.content, Post.excerpt, Post.featured_image, Post.status,
+                      Post.created_at, Post.updated_at, User.username.label('author'))
+            .outerjoin(User, User.id == Post.author_id)
+            .where(Post.id > last_id)
+            .order_by(Post.id)
+            .limit(EXPORT_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        links = {}
+        for post_id, slug in db.session.execute(
+            db.select(post_categories.c.post_id, Category.slug)
+            .join(Category, Category.id == post_categories.c.category_id)
+            .where(post_categories.c.post_id.in_([row.id for row in rows]))
+        ):
+            links.setdefault(post_id, []).append(slug)
+        for row in rows:
+            yield {'type': 'post', 'slug': row.slug, 'title': row.title, 'content': row.content,
+                   'excerpt': row.excerpt, 'featured_image': row.featured_image, 'status': row.status,
+                   'author': row.author, 'created_at': isoformat(row.created_at),
+                   'updated_at': isoformat(row.updated_at), 'categories': sorted(links.get(row.id, []))}
+        # Let the identity map go between batches
+        db.session.expunge_all()
+
+def export_ndjson():
+    for record in export_records():
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+class ContentImporter:
+    """Upserts exported records by slug in batches of bulk statements.
+
+    Each batch commits on its own and committed_line tracks the last input
+    line it covers, so an interrupted import can resume from there. Records
+    are matched by slug, so feeding the same lines twice is harmless.
+    """
+
+    def __init__(self, default_author_id, batch_size=1000, render=map, progress=None):
+        self.default_author_id = default_author_id
+        self.batch_size = batch_size
+        self.render = render
+        self.progress = progress
+        self.author_ids = {}
+        self.category_ids = {}
+        self.pending_type = None
+        self.pending = {}
+        self.pending_parents = {}
+        self.line = 0
+        self.committed_line = 0
+        self.counts = {'categories': 0, 'posts': 0, 'links': 0}
+
+    def feed(self, lines, skip=0):
+        for self.line, raw in enumerate(lines, 1):
+            if self.line <= skip:
+                self.committed_line = self.line
+                continue
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                raise ValueError(f'Line {self.line}: invalid JSON')
+            record_type = record.get('type') if isinstance(record, dict) else None
+            if record_type not in ('category', 'post'):
+                raise ValueError(f'Line {self.line}: unknown record type')
+            if not record.get('slug') or (record_type == 'post' and not record.get('title')):
+                raise ValueError(f'Line {self.line}: slug and title are required')
+            if record_type != self.pending_type or len(self.pending) >= self.batch_size:
+                self.flush(through=self.line - 1)
+                self.pending_type = record_type
+            self.pending[record['slug']] = record
+        self.flush(through=self.line)
+
+    def finish(self):
+        """Refresh the counters and cached pages derived from the imported rows"""
+        self.flush()
+        rebuild_category_paths()
+        reconcile_stats()
+        page_cache.invalidate()
+        return self.counts
+
+    def flush(self, through=None):
+        if not self.pending:
+            return
+        if self.pending_type == 'category':
+            self.write_categories(self.pending)
+        else:
+            self.write_posts(self.pending)
+        db.session.commit()
+        self.committed_line = through if through is not None else self.line
+        self.pending = {}
+        if self.progress:
+            self.progress(self)
+
+    def resolve_categories(self, slugs):
+        missing = {slug for slug in slugs if slug and slug not in self.category_ids}
+        if missing:
+            self.category_ids.update(db.session.execute(
+                db.select(Category.slug, Category.id).where(Category.slug.in_(missing))
+            ).all())
+
+    def resolve_authors(self, usernames):
+        missing = {name for name in usernames if name and name not in self.author_ids}
+        if missing:
+            self.author_ids.update(db.session.execute(
+                db.select(User.username, User.id).where(User.username.in_(missing))
+            ).all())
+
+    def upsert(self, model, rows):
+        """Bulk insert new slugs and bulk update existing ones; returns slug -> id"""
+        existing = dict(db.session.execute(
+            db.select(model.slug, model.id).where(model.slug.in_([row['slug'] for row in rows]))
+        ).all())
+        inserts = [row for row in rows if row['slug'] not in existing]
+        updates = [dict(row, id=existing[row['slug']]) for row in rows if row['slug'] in existing]
+        if inserts:
+            db.session.execute(db.insert(model), inserts)
+            existing.update(db.session.execute(
+                db.select(model.slug, model.id).where(model.slug.in_([row['slug'] for row in inserts]))
+            ).all())
+        if updates:
+            db.session.execute(db.update(model), updates)
+        return existing
+
+    def write_categories(self, records):
+        now = datetime.utcnow()
+        ids = self.upsert(Category, [
+            {'slug': slug, 'name': record.get('name') or slug, 'description': record.get('description'),
+             'created_at': parse_datetime(record.get('created_at')) or now}
+            for slug, record in records.items()
+        ])
+        self.category_ids.update(ids)
+        parents = {slug: record.get('parent') for slug, record in records.items()}
+        # Children seen earlier whose parent arrives in this batch
+        parents.update((slug, parent) for slug, parent in self.pending_parents.items() if parent in ids)
+        self.resolve_categories(parents.values())
+        db.session.execute(db.update(Category), [
+            {'id': self.category_ids[slug], 'parent_id': self.category_ids.get(parent)} for slug, parent in parents.items()
+        ])
+        for slug, parent in parents.items():
+            if parent and parent not in self.category_ids:
+                self.pending_parents[slug] = parent
+            else:
+                self.pending_parents.pop(slug, None)
+        self.counts['categories'] += len(records)
+
+    def write_posts(self, records):
+        now = datetime.utcnow()
+        self.resolve_authors(record.get('author') for record in records.values())
+        rendered = self.render(render_post_content, [record.get('content') for record in records.values()])
+        rows = []
+        for (slug, record), values in zip(records.items(), rendered):
+            created_at = parse_datetime(record.get('created_at')) or now
+            rows.append(dict(
+                values,
+                slug=slug,
+                title=record['title'],
+                content=record.get('content'),
+                excerpt=record.get('excerpt') or values['excerpt'],
+                featured_image=record.get('featured_image'),
+                status=record.get('status') or 'draft',
+                author_id=self.author_ids.get(record.get('author'), self.default_author_id),
+                created_at=created_at,
+                updated_at=parse_datetime(record.get('updated_at')) or created_at,
+            ))
+        ids = self.upsert(Post, rows)
+        
+        # Replace the category links of every post in the batch
+        self.resolve_categories(slug for record in records.values() for slug in record.get('categories') or ())
+        links = {
+            (ids[slug], self.category_ids[category])
+            for slug, record in records.items()
+            for category in record.get('categories') or ()
+            if category in self.category_ids
+        }
+        db.session.execute(post_categories.delete().where(post_categories.c.post_id.in_(ids.values())))
+        if links:
+            db.session.execute(post_categories.insert(), [
+                {'post_id': post_id, 'category_id': category_id} for post_id, category_id in links
+            ])
+        
+        # Bulk statements skip the mapper events that keep search in sync
+        connection = db.session.connection()
+        search_backend_for(connection.dialect.name).index_posts(connection, db.session.execute(
+            db.select(Post.id, Post.title, Post.excerpt, Post.content).where(Post.id.in_(ids.values()))
+        ).all())
+        self.counts['posts'] += len(records)
+        self.counts['links'] += len(links)
+
+def default_import_author():
+    user = User.query.filter_by(role='admin').order_by(User.id).first()
+    return user.id if user else None
+
+@app.cli.command('export-content')
+@click.argument('output', type=click.File('w', encoding='utf-8'), default='-')
+def export_content_command(output):
+    """Write all categories and posts as NDJSON (to stdout by default)."""
+    count = 0
+    for line in export_ndjson():
+        output.write(line)
+        count += 1
+    click.echo(f'Exported {count} records', err=True)
+
+@app.cli.command('import-content')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--batch-size', default=1000, show_default=True, help='Records written per transaction.')
+@click.option('--resume-from', default=0, help='Skip this many lines, as reported by an interrupted run.')
+@click.option('--author', help='Username for posts whose author does not exist here (default: first admin).')
+@click.option('--workers', default=0, help='Worker processes (default: one per CPU).')
+def import_content_command(source, batch_size, resume_from, author, workers):
+    """Upsert categories and posts from an NDJSON export."""
+    if author:
+        user = User.query.filter_by(username=author).first()
+        author_id = user.id if user else None
+    else:
+        author_id = default_import_author()
+    if author_id is None:
+        raise click.ClickException('No author to assign imported posts to')
+    
+    with ProcessPoolExecutor(max_workers=workers or None, mp_context=multiprocessing.get_context('spawn')) as executor:
+        importer = ContentImporter(
+            author_id, batch_size, render=partial(executor.map, chunksize=64),
+            progress=lambda importer: print(f'Committed through line {importer.committed_line}')
+        )
+        try:
+            importer.feed(source, skip=resume_from)
+        except ValueError as e:
+            db.session.rollback()
+            raise click.ClickException(f'{e}; resume with --resume-from {importer.committed_line}')
+        counts = importer.finish()
+    print(f"Imported {counts['categories']} categories, {counts['posts']} posts and {counts['links']} links")
+
+# Synthetic data and route benchmarks
+SEED_WORDS = (
+    'data', 'sistem', 'konten', 'artikel', 'bisnis', 'teknologi', 'pasar', 'digital', 'layanan', 'pengguna',
+    'kota', 'desa', 'sekolah', 'kesehatan', 'energi', 'air', 'jalan', 'modal', 'produk', 'tim', 'proses',
+    'analisis', 'laporan', 'strategi', 'inovasi', 'budaya', 'olahraga', 'makanan', 'wisata', 'musik',
+    'baru', 'cepat', 'besar', 'kecil', 'penting', 'terbuka', 'lokal', 'global', 'aman', 'mudah',
+    'membangun', 'mengelola', 'meningkatkan', 'menjaga', 'memilih', 'menulis', 'membaca', 'menguji'
 )
 
+def seed_sentence(rng, words):
+    return ' '.join(rng.choice(SEED_WORDS) for _ in range(words)).capitalize() + '.'
+
+def insert_rows(model, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(db.insert(model), rows[start:start + batch_size])
+
+def sync_id_sequences(*models):
+    """Move Postgres id sequences past rows inserted with explicit ids; SQLite needs nothing"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for model in models:
+        # pg_get_serial_sequence parses its argument as an identifier, so 'user' needs its quotes there too
+        table = str(db.engine.dialect.identifier_preparer.quote(model.__table__.name))
+        db.session.execute(db.select(func.setval(
+            func.pg_get_serial_sequence(table, 'id'),
+            db.select(func.coalesce(func.max(model.id), 1)).scalar_subquery()
+        )))
+
+@app.cli.command('seed-data')
+@click.option('--users', default=50, show_default=True)
+@click.option('--categories', default=200, show_default=True)
+@click.option('--posts', default=10000, show_default=True)
+@click.option('--media', default=5000, show_default=True)
+@click.option('--seed', default=1, show_default=True, help='Same seed, same data.')
+@click.option('--password', default='password', show_default=True, help='Password of every generated user.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per INSERT batch.')
+def seed_data_command(users, categories, posts, media, seed, password, batch_size):
+    """Generate synthetic users, nested categories, posts, category links and media rows."""
+    prefix = f'seed{seed}-'
+    if User.query.filter_by(username=f'{prefix}admin').first():
+        raise click.ClickException(f'Data for seed {seed} already exists; pick another --seed')
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    
+    def timestamp():
+        return now - timedelta(seconds=rng.randrange(2 * 365 * 24 * 3600))
+    
+    def next_id(model):
+        return (db.session.scalar(db.select(func.max(model.id))) or 0) + 1
+    
+    # Ids are assigned here so that links need no read-back; one hash serves every user
+    password_hash = password_hasher.hash(password)
+    base = next_id(User)
+    user_rows = [
+        {'id': base + n, 'username': f'{prefix}admin' if n == 0 else f'{prefix}user{n}',
+         'email': f'{prefix}user{n}@example.com', 'password_hash': password_hash,
+         'full_name': f'Pengguna {n}', 'role': 'admin' if n == 0 else 'author',
+         'created_at': timestamp()}
+        for n in range(max(users, 1))
+    ]
+    insert_rows(User, user_rows, batch_size)
+    user_ids = [row['id'] for row in user_rows]
+    
+    # Roughly a third are top-level; the rest nest under an earlier category
+    base = next_id(Category)
+    category_rows = []
+    for n in range(categories):
+        parent_id = category_rows[rng.randrange(n)]['id'] if n and rng.random() < 0.65 else None
+        category_rows.append({
+            'id': base + n, 'name': f'{seed_sentence(rng, 2)[:-1]} {n}', 'slug': f'{prefix}kategori-{n}',
+            'description': seed_sentence(rng, 12), 'parent_id': parent_id, 'created_at': timestamp()
+        })
+    insert_rows(Category, category_rows, batch_size)
+    category_ids = [row['id'] for row in category_rows]
+    
+    # Generated content is already clean HTML, so the rendered columns are filled directly
+    base = next_id(Post)
+    for start in range(0, posts, batch_size):
+        post_rows, link_rows = [], []
+        for n in range(start, min(start + batch_size, posts)):
+            paragraphs = [seed_sentence(rng, rng.randrange(20, 80)) for _ in range(rng.randrange(2, 8))]
+            plain_text = ' '.join(paragraphs)
+            word_count = len(plain_text.split())
+            created_at = timestamp()
+            content = ''.join(f'<p>{paragraph}</p>' for paragraph in paragraphs)
+            post_rows.append({
+                'id': base + n, 'title': seed_sentence(rng, rng.randrange(3, 9))[:-1], 'slug': f'{prefix}artikel-{n}',
+                'content': content, 'content_html': content, 'excerpt': make_excerpt(plain_text),
+                'word_count': word_count, 'reading_time': max(1, -(-word_count // WORDS_PER_MINUTE)),
+                'status': 'published' if rng.random() < 0.8 else 'draft', 'author_id': rng.choice(user_ids),
+                'created_at': created_at, 'updated_at': created_at + timedelta(seconds=rng.randrange(86400))
+            })
+            if category_ids:
+                for category_id in rng.sample(category_ids, min(len(category_ids), rng.randrange(1, 4))):
+                    link_rows.append({'post_id': base + n, 'category_id': category_id})
+        db.session.execute(db.insert(Post), post_rows)
+        if link_rows:
+            db.session.execute(post_categories.insert(), link_rows)
+        db.session.commit()
+    
+    media_types = (('image/jpeg', '.jpg'), ('image/png', '.png'), ('application/pdf', '.pdf'))
+    base = next_id(Media)
+    media_rows = []
+    for n in range(media):
+        file_type, extension = rng.choice(media_types)
+        media_rows.append({
+            'id': base + n, 'filename': f'{prefix}{n}{extension}', 'original_filename': f'berkas-{n}{extension}',
+            'file_type': file_type, 'file_size': rng.randrange(10_000, 5_000_000),
+            'uploaded_by': rng.choice(user_ids), 'created_at': timestamp()
+        })
+    insert_rows(Media, media_rows, batch_size)
+    sync_id_sequences(User, Category, Post, Media)
+    db.session.commit()
+    
+    with db.engine.begin() as connection:
+        search_backend_for(connection.dialect.name).rebuild(connection)
+    rebuild_category_paths()
+    reconcile_stats()
+    page_cache.invalidate()
+    print(f'Generated {len(user_rows)} users, {categories} categories, {posts} posts and {media} media '
+          f'in {time.perf_counter() - started:.1f}s (admin login: {prefix}admin)')
+
+def benchmark_routes():
+    """Name and request arguments of each benchmarked route; login runs without a session"""
+    routes = [('admin_dashboard', 'GET', '/admin')]
+    routes += [(f'admin_posts[{sort}]', 'GET', f'/admin/posts?sort={sort}') for sort in POST_SORTS]
+    routes += [
+        ('admin_categories', 'GET', '/admin/categories'),
+        ('admin_media', 'GET', '/admin/media'),
+        ('login', 'POST', '/admin/login'),
+    ]
+    return routes
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+@app.cli.command('bench-routes')
+@click.option('--requests', 'count', default=50, show_default=True, help='Timed requests per route.')
+@click.option('--username', default='seed1-admin', show_default=True)
+@click.option('--password', default='password', show_default=True)
+@click.option('--save', type=click.Path(dir_okay=False), help='Write the results as a new baseline.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='Compare against a saved baseline.')
+@click.option('--tolerance', default=0.2, show_default=True, help='Allowed p95 slowdown before failing, as a fraction.')
+def bench_routes_command(count, username, password, save, baseline, tolerance):
+    """Time the main admin routes through the test client."""
+    app.config['WTF_CSRF_ENABLED'] = False
+    credentials = {'username': username, 'password': password}
+    queries = []
+    def count_queries(*args):
+        queries.append(1)
+    engine = db.engine
+    
+    def measure():
+        client = app.test_client()
+        if client.post('/admin/login', data=credentials).status_code != 302:
+            raise click.ClickException(f'Could not log in as {username}; run flask seed-data first')
+        results = {}
+        for name, method, path in benchmark_routes():
+            def call():
+                # Each login starts from a fresh session, or it would just redirect
+                session_client = app.test_client() if name == 'login' else client
+                response = session_client.open(path, method=method, data=credentials if method == 'POST' else None)
+                if response.status_code >= 400:
+                    raise click.ClickException(f'{name} answered {response.status_code}')
+            # Warm caches, then measure peak allocations on a separate run
+            call()
+            tracemalloc.start()
+            call()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            samples = []
+            del queries[:]
+            for _ in range(count):
+                started = time.perf_counter()
+                call()
+                samples.append((time.perf_counter() - started) * 1000)
+            results[name] = {
+                'p50_ms': round(statistics.median(samples), 2),
+                'p95_ms': round(percentile(samples, 0.95), 2),
+                'p99_ms': round(percentile(samples, 0.99), 2),
+                'queries': round(len(queries) / count, 1),
+                'peak_kb': round(peak / 1024),
+            }
+        return results
+    
+    # Requests made under the command's app context would share its g (and the logged-in
+    # user); an empty context gives each request its own, as in a real server
+    event.listen(engine, 'before_cursor_execute', count_queries)
+    try:
+        results = contextvars.Context().run(measure)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_queries)
+    
+    previous = {}
+    if baseline:
+        with open(baseline) as f:
+            previous = json.load(f)
+    print(f"{'route':<24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'peak KB':>8}"
+          + ('  vs baseline p95' if previous else ''))
+    regressions = []
+    for name, result in results.items():
+        line = (f"{name:<24} {result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9} "
+                f"{result['queries']:>8} {result['peak_kb']:>8}")
+        before = previous.get(name)
+        if before:
+            change = result['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0
+            line += f'  {change:+.0%}'
+            if change > tolerance or result['queries'] > before['queries']:
+                regressions.append(name)
+                line += ' REGRESSION'
+        print(line)
+    
+    if save:
+        with open(save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Baseline saved to {save}')
+    if regressions:
+        raise click.ClickException(f"Slower than baseline: {', '.join(regressions)}")
+
+# What a connection gets without the profile (SQLite's own defaults)
+SQLITE_DEFAULT_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+def stress_worker(path, pragmas, seconds, write_ratio, seed):
+    """Mix post list reads and post updates on one connection until the time is up.
+
+    Returns the read and write latencies and the number of operations that
+    failed with "database is locked".
+    """
+    rng = random.Random(seed)
+    # pysqlite's own 5 second lock wait, which SQLAlchemy also uses
+    connection = sqlite3.connect(path, timeout=5)
+    apply_sqlite_pragmas(connection, pragmas)
+    post_ids = [row[0] for row in connection.execute('SELECT id FROM post')]
+    latencies = {'read': [], 'write': []}
+    locked = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if post_ids and rng.random() < write_ratio:
+                kind = 'write'
+                connection.execute('UPDATE post SET updated_at = ? WHERE id = ?',
+                                   (datetime.utcnow().isoformat(' '), rng.choice(post_ids)))
+                connection.commit()
+            else:
+                kind = 'read'
+                connection.execute(
+                    'SELECT id, title, status, created_at FROM post ORDER BY created_at DESC, id DESC LIMIT 20'
+                ).fetchall()
+        except sqlite3.OperationalError:
+            connection.rollback()
+            locked += 1
+            continue
+        latencies[kind].append(time.perf_counter() - started)
+    connection.close()
+    return latencies, locked
+
+@app.cli.command('stress-db')
+@click.option('--workers', default=4, show_default=True, help='Concurrent worker processes.')
+@click.option('--seconds', default=5.0, show_default=True, help='Run time per profile.')
+@click.option('--write-ratio', default=0.2, show_default=True, help='Share of operations that write.')
+def stress_db_command(workers, seconds, write_ratio):
+    """Compare SQLite throughput with and without the connection profile."""
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        raise click.ClickException('stress-db needs a SQLite database file')
+    profiles = {'default': SQLITE_DEFAULT_PRAGMAS, 'tuned': sqlite_pragmas(app.config)}
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, pragmas in profiles.items():
+            # Each profile gets its own copy, since the journal mode is stored in the file
+            path = os.path.join(directory, f'{name}.db')
+            source = sqlite3.connect(url.database)
+            target = sqlite3.connect(path)
+            source.backup(target)
+            source.close()
+            # Switch the journal mode before the workers open the file; changing it needs exclusive access
+            target.execute(f"PRAGMA journal_mode={pragmas['journal_mode']}")
+            target.close()
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                runs = list(executor.map(
+                    stress_worker, [path] * workers, [pragmas] * workers, [seconds] * workers,
+                    [write_ratio] * workers, range(workers)
+                ))
+            reads = [sample for latencies, _ in runs for sample in latencies['read']]
+            writes = [sample for latencies, _ in runs for sample in latencies['write']]
+            results[name] = {
+                'reads': len(reads) / seconds,
+                'writes': len(writes) / seconds,
+                'read_p95': percentile(reads, 0.95) * 1000 if reads else 0,
+                'write_p95': percentile(writes, 0.95) * 1000 if writes else 0,
+                'locked': sum(locked for _, locked in runs),
+            }
+    
+    print(f"{'profile':<8} {'reads/s':>10} {'writes/s':>10} {'read p95 ms':>12} {'write p95 ms':>13} {'locked':>7}")
+    for name, result in results.items():
+        print(f"{name:<8} {result['reads']:>10.0f} {result['writes']:>10.0f} {result['read_p95']:>12.2f} "
+              f"{result['write_p95']:>13.2f} {result['locked']:>7}")
+    default, tuned = results['default'], results['tuned']
+    if default['reads'] and default['writes']:
+        print(f"tuned vs default: reads x{tuned['reads'] / default['reads']:.1f}, "
+              f"writes x{tuned['writes'] / default['writes']:.1f}")
+
+# What templates and permission checks read from current_user
+SESSION_USER_COLUMNS = ('id', 'username', 'email', 'full_name', 'role', 'created_at')
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    values, version = user_cache.get(user_id)
+    if values is not None:
+        # Attach the cached row to this request's session without a SELECT; the columns left
+        # out (password hash, reset token) load on first access, as deferred columns do
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    user = db.session.get(User, user_id)
+    if user:
+        user_cache.put(user_id, {name: getattr(user, name) for name in SESSION_USER_COLUMNS}, version)
+    return user
 
 # Routes
 @app.route('/')
@@ -133,17 +2770,52 @@ def index():
         return redirect(url_for('admin_dashboard'))
     return redirect(url_for('login'))
 
+@app.route('/post/<slug>')
+@query_budget(3)
+def public_post(slug):
+    key = ('post', slug)
+    page, version = page_cache.get(key)
+    if page is None:
+        post = (
+            Post.query.options(joinedload(Post.author), selectinload(Post.categories))
+            .filter_by(slug=slug, status='published')
+            .first_or_404()
+        )
+        body = render_template('public/post.html', post=post).encode()
+        page = page_cache.put(key, body, version)
+    return page_response(page)
+
+@app.route('/category/<slug>')
+@query_budget(4)
+def public_category(slug):
+    after = request.args.get('after')
+    before = request.args.get('before')
+    key = ('category', slug, after, before)
+    page, version = page_cache.get(key)
+    if page is None:
+        category = Category.query.filter_by(slug=slug).first_or_404()
+        # Posts filed under this category or any category below it (just this one until it is indexed)
+        in_subtree = (
+            db.select(post_categories.c.post_id)
+            .join(Category, Category.id == post_categories.c.category_id)
+            .where(subtree_condition(category.path) if category.path else Category.id == category.id)
+        )
+        query = Post.query.options(joinedload(Post.author)).filter(Post.id.in_(in_subtree), Post.status == 'published')
+        columns, descending = POST_SORTS['newest']
+        posts = keyset_page(query, columns, descending, get_posts_per_page(), after=after, before=before)
+        body = render_template('public/category.html', category=category, ancestors=category_ancestors(category),
+                               posts=posts.items, page=posts).encode()
+        page = page_cache.put(key, body, version)
+    return page_response(page)
+
 @app.route('/admin')
 @login_required
+@query_budget(4)
+@read_replica
 def admin_dashboard():
     try:
-        stats = {
-            'posts': Post.query.count(),
-            'categories': Category.query.count(),
-            'users': User.query.count(),
-            'media': Media.query.count()
-        }
-        recent_posts = Post.query.order_by(Post.created_at.desc()).limit(5).all()
+        stats = get_stats()
+        recent_posts = Post.query.options(joinedload(Post.author)).order_by(Post.created_at.desc()).limit(5).all()
         recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
         return render_template('admin/dashboard.html', stats=stats, recent_posts=recent_posts, recent_users=recent_users)
     except Exception as e:
@@ -162,7 +2834,23 @@ def login():
         remember = request.form.get('remember') == 'on'
         
         user = User.query.filter_by(username=username).first()
-        if user and user.check_password(password):
+        try:
+            authenticated = user is not None and user.check_password(password)
+        except PasswordHasherBusy:
+            flash('Server sedang sibuk, silakan coba lagi sebentar lagi.', 'warning')
+            return render_template('admin/login.html'), 503
+        
+        if authenticated:
+            # Upgrade (or downgrade) the stored hash to the configured cost; when the
+            # hasher is busy the upgrade waits for a later login
+            if password_hasher.needs_rehash(user.password_hash):
+                try:
+                    user.set_password(password)
+                except PasswordHasherBusy:
+                    pass
+                else:
+                    db.session.commit()
+                    user_cache.invalidate(user.id)
             login_user(user, remember=remember)
             next_page = request.args.get('next')
             if not next_page or not next_page.startswith('/'):
@@ -182,32 +2870,45 @@ def logout():
 
 @app.route('/admin/posts')
 @login_required
+@query_budget(5)  # search adds one query for the ranked hits
+@read_replica
 def admin_posts():
     # Get sort parameter from query string
     sort = request.args.get('sort', 'newest')
     status = request.args.get('status', 'all')
+    if sort not in POST_SORTS:
+        sort = 'newest'
+    
+    # Targets for the bulk category actions
+    categories = Category.query.order_by(Category.name).all()
+    
+    # Search results are ordered by relevance and paged by number
+    q = request.args.get('q', '').strip()
+    if q:
+        search_page = max(request.args.get('page', 1, type=int), 1)
+        posts, has_more = search_posts(
+            q, None if status == 'all' else status, search_page, get_posts_per_page()
+        )
+        return render_template('admin/posts.html', posts=posts, q=q, search_page=search_page,
+                               has_more=has_more, sort=sort, status=status, categories=categories)
     
-    # Base query
-    query = Post.query
+    # Base query, loading the author and categories shown on each row up front
+    query = Post.query.options(joinedload(Post.author), selectinload(Post.categories))
     
     # Apply status filter
     if status != 'all':
         query = query.filter_by(status=status)
     
-    # Apply sorting
-    if sort == 'newest':
-        query = query.order_by(Post.created_at.desc())
-    elif sort == 'oldest':
-        query = query.order_by(Post.created_at.asc())
-    elif sort == 'title':
-        query = query.order_by(Post.title.asc())
-    elif sort == 'status':
-        query = query.order_by(Post.status.asc())
-    
-    # Execute query
-    posts = query.all()
+    # Fetch a single page, keyed on the sort columns plus id as tie-breaker
+    columns, descending = POST_SORTS[sort]
+    page = keyset_page(
+        query, columns, descending, get_posts_per_page(),
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
     
-    return render_template('admin/posts.html', posts=posts, sort=sort, status=status)
+    return render_template('admin/posts.html', posts=page.items, page=page, sort=sort, status=status,
+                           categories=categories)
 
 @app.route('/admin/posts/create', methods=['GET', 'POST'])
 @login_required
@@ -227,14 +2928,12 @@ def admin_create_post():
             author_id=current_user.id
         )
         
-        # Add categories
-        for category_id in category_ids:
-            category = Category.query.get(category_id)
-            if category:
-                post.categories.append(category)
+        post.categories = resolve_categories(category_ids)
         
         db.session.add(post)
+        bump_post_stats(post.status, 1)
         db.session.commit()
+        page_cache.invalidate()
         
         flash('Post created successfully!', 'success')
         return redirect(url_for('admin_posts'))
@@ -248,20 +2947,16 @@ def admin_edit_post(post_id):
     post = Post.query.get_or_404(post_id)
     
     if request.method == 'POST':
+        move_post_stats(post.status, request.form.get('status'))
         post.title = request.form.get('title')
         post.slug = request.form.get('slug')
         post.content = request.form.get('content')
         post.status = request.form.get('status')
         
-        # Update categories
-        post.categories = []
-        category_ids = request.form.getlist('categories')
-        for category_id in category_ids:
-            category = Category.query.get(category_id)
-            if category:
-                post.categories.append(category)
+        sync_post_categories(post, resolve_categories(request.form.getlist('categories')))
         
         db.session.commit()
+        page_cache.invalidate()
         flash('Post updated successfully!', 'success')
         return redirect(url_for('admin_posts'))
     
@@ -272,8 +2967,10 @@ def admin_edit_post(post_id):
 @login_required
 def admin_delete_post(post_id):
     post = Post.query.get_or_404(post_id)
+    bump_post_stats(post.status, -1)
     db.session.delete(post)
     db.session.commit()
+    page_cache.invalidate()
     flash('Post deleted successfully!', 'success')
     return redirect(url_for('admin_posts'))
 
@@ -281,23 +2978,172 @@ def admin_delete_post(post_id):
 @login_required
 def admin_publish_post(post_id):
     post = Post.query.get_or_404(post_id)
+    move_post_stats(post.status, 'published')
     post.status = 'published'
     db.session.commit()
+    page_cache.invalidate()
     return jsonify({'success': True})
 
 @app.route('/admin/posts/<int:post_id>/unpublish', methods=['POST'])
 @login_required
 def admin_unpublish_post(post_id):
     post = Post.query.get_or_404(post_id)
+    move_post_stats(post.status, 'draft')
     post.status = 'draft'
     db.session.commit()
+    page_cache.invalidate()
     return jsonify({'success': True})
 
+BULK_POST_ACTIONS = {'publish', 'unpublish', 'delete', 'add_category', 'remove_category'}
+
+@app.route('/admin/posts/bulk', methods=['POST'])
+@login_required
+def admin_bulk_posts():
+    """Apply one action to many posts with set-based statements in a single transaction.
+
+    Takes JSON with an action and either a list of post ids or an explicit
+    filter such as {"status": "draft"}, and reports the outcome for each post.
+    A request with neither is rejected rather than applied to every post.
+    """
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    if action not in BULK_POST_ACTIONS:
+        return jsonify({'success': False, 'error': 'Unknown action'}), 400
+    
+    ids = data.get('ids')
+    post_filter = data.get('filter')
+    if ids is not None:
+        if not isinstance(ids, list) or any(isinstance(post_id, bool) for post_id in ids):
+            return jsonify({'success': False, 'error': 'Invalid post ids'}), 400
+        try:
+            ids = {int(post_id) for post_id in ids}
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Invalid post ids'}), 400
+        condition = Post.id.in_(ids)
+    elif isinstance(post_filter, dict) and post_filter.get('status') in POST_STATUS_STATS:
+        condition = Post.status == post_filter['status']
+    else:
+        return jsonify({'success': False, 'error': 'Give a list of post ids or a status filter'}), 400
+    
+    category = None
+    if action in ('add_category', 'remove_category'):
+        try:
+            category = db.session.get(Category, int(data.get('category_id')))
+        except (TypeError, ValueError):
+            pass
+        if category is None:
+            return jsonify({'success': False, 'error': 'Category not found'}), 400
+    
+    rows = db.session.execute(db.select(Post.id, Post.status).where(condition)).all()
+    targets = db.select(Post.id).where(condition)
+    outcomes = {post_id: 'not_found' for post_id in ids or ()}
+    
+    if action in ('publish', 'unpublish'):
+        new_status = 'published' if action == 'publish' else 'draft'
+        changed = [row for row in rows if row.status != new_status]
+        db.session.execute(
+            db.update(Post)
+            .where(Post.id.in_(targets), Post.status != new_status)
+            .values(status=new_status, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        deltas = {}
+        for row in changed:
+            if row.status in POST_STATUS_STATS:
+                deltas[POST_STATUS_STATS[row.status]] = deltas.get(POST_STATUS_STATS[row.status], 0) - 1
+        deltas[POST_STATUS_STATS[new_status]] = len(changed)
+        bump_stats(**deltas)
+        outcomes.update({row.id: 'unchanged' for row in rows})
+        outcomes.update({row.id: new_status for row in changed})
+    elif action == 'delete':
+        db.session.execute(post_categories.delete().where(post_categories.c.post_id.in_(targets)))
+        db.session.execute(db.delete(Post).where(condition).execution_options(synchronize_session=False))
+        search_backend_for(db.engine.dialect.name).remove_posts(db.session.connection(), [row.id for row in rows])
+        deltas = {'posts': -len(rows)}
+        for row in rows:
+            if row.status in POST_STATUS_STATS:
+                deltas[POST_STATUS_STATS[row.status]] = deltas.get(POST_STATUS_STATS[row.status], 0) - 1
+        bump_stats(**deltas)
+        outcomes.update({row.id: 'deleted' for row in rows})
+    else:
+        linked = set(db.session.scalars(
+            db.select(post_categories.c.post_id)
+            .where(post_categories.c.category_id == category.id, post_categories.c.post_id.in_(targets))
+        ))
+        if action == 'add_category':
+            db.session.execute(post_categories.insert().from_select(
+                ['post_id', 'category_id'],
+                db.select(Post.id, db.literal(category.id)).where(
+                    Post.id.in_(targets),
+                    ~db.exists().where(post_categories.c.post_id == Post.id,
+                                       post_categories.c.category_id == category.id)
+                )
+            ))
+            outcomes.update({row.id: 'unchanged' if row.id in linked else 'added' for row in rows})
+        else:
+            db.session.execute(post_categories.delete().where(
+                post_categories.c.category_id == category.id, post_categories.c.post_id.in_(targets)
+            ))
+            outcomes.update({row.id: 'removed' if row.id in linked else 'unchanged' for row in rows})
+    
+    db.session.commit()
+    # Drop stale relationship and status values held by the identity map
+    db.session.expire_all()
+    page_cache.invalidate()
+    
+    counts = {}
+    for outcome in outcomes.values():
+        counts[outcome] = counts.get(outcome, 0) + 1
+    return jsonify({
+        'success': True,
+        'counts': counts,
+        'results': [{'id': post_id, 'outcome': outcome} for post_id, outcome in sorted(outcomes.items())]
+    })
+
+@app.route('/admin/export')
+@login_required
+@read_replica
+def admin_export_content():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Forbidden'}), 403
+    return Response(
+        stream_with_context(export_ndjson()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=content.ndjson'}
+    )
+
+@app.route('/admin/import', methods=['POST'])
+@login_required
+def admin_import_content():
+    """Import an NDJSON request body; on error, resume_from tells the client where to restart"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Forbidden'}), 403
+    importer = ContentImporter(current_user.id)
+    try:
+        importer.feed(request.stream, skip=request.args.get('resume_from', 0, type=int))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e), 'resume_from': importer.committed_line}), 400
+    return jsonify({'success': True, 'counts': importer.finish(), 'lines': importer.committed_line})
+
 @app.route('/admin/categories')
 @login_required
+@query_budget(2)
+@read_replica
 def admin_categories():
-    categories = Category.query.all()
-    return render_template('admin/categories.html', categories=categories)
+    # Count links per category in the same query instead of loading category.posts
+    rows = (
+        db.session.query(Category, func.count(post_categories.c.post_id))
+        .outerjoin(post_categories, post_categories.c.category_id == Category.id)
+        .group_by(Category.id)
+        .order_by(Category.id)
+        .all()
+    )
+    categories = []
+    for category, post_count in rows:
+        category.post_count = post_count
+        categories.append(category)
+    return render_template('admin/categories.html', categories=category_tree(categories))
 
 @app.route('/admin/categories/create', methods=['POST'])
 @login_required
@@ -305,17 +3151,22 @@ def admin_create_category():
     name = request.form.get('name')
     slug = request.form.get('slug')
     description = request.form.get('description')
-    parent_id = request.form.get('parent_id') or None
+    parent_id = request.form.get('parent_id', type=int)
+    ensure_category_paths()
+    parent = Category.query.get_or_404(parent_id) if parent_id else None
     
     category = Category(
         name=name,
         slug=slug,
-        description=description,
-        parent_id=parent_id
+        description=description
     )
     
     db.session.add(category)
+    db.session.flush()
+    set_category_parent(category, parent)
+    bump_stats(categories=1)
     db.session.commit()
+    page_cache.invalidate()
     
     flash('Category created successfully!', 'success')
     return redirect(url_for('admin_categories'))
@@ -323,31 +3174,108 @@ def admin_create_category():
 @app.route('/admin/categories/<int:category_id>/edit', methods=['POST'])
 @login_required
 def admin_edit_category(category_id):
+    ensure_category_paths()
     category = Category.query.get_or_404(category_id)
     
     category.name = request.form.get('name')
     category.slug = request.form.get('slug')
     category.description = request.form.get('description')
-    category.parent_id = request.form.get('parent_id') or None
+    parent_id = request.form.get('parent_id', type=int)
+    parent = Category.query.get_or_404(parent_id) if parent_id else None
+    if not set_category_parent(category, parent):
+        db.session.rollback()
+        flash('A category cannot be moved under itself or one of its subcategories', 'error')
+        return redirect(url_for('admin_categories'))
     
     db.session.commit()
+    page_cache.invalidate()
     flash('Category updated successfully!', 'success')
     return redirect(url_for('admin_categories'))
 
+@app.route('/admin/categories/<int:category_id>/retag', methods=['POST'])
+@login_required
+def admin_retag_category(category_id):
+    """Copy, move or merge a category's posts into another category"""
+    ensure_category_paths()
+    source = Category.query.get_or_404(category_id)
+    target = Category.query.get_or_404(request.form.get('target_id', type=int) or 0)
+    mode = request.form.get('mode')
+    if mode not in CATEGORY_RETAG_MODES or target.id == source.id:
+        flash('Choose another category and a copy, move or merge action', 'error')
+        return redirect(url_for('admin_categories'))
+    if mode == 'merge' and target.path.startswith(source.path):
+        flash('A category cannot be merged into one of its own subcategories', 'error')
+        return redirect(url_for('admin_categories'))
+    
+    source_name = source.name
+    added = retag_category(source, target, mode)
+    db.session.commit()
+    # Drop stale relationship values held by the identity map
+    db.session.expire_all()
+    page_cache.invalidate()
+    if mode == 'merge':
+        flash(f'Category {source_name} merged into {target.name} ({added} posts added)', 'success')
+    else:
+        flash(f'{added} posts {"copied" if mode == "copy" else "moved"} from {source_name} to {target.name}', 'success')
+    return redirect(url_for('admin_categories'))
+
 @app.route('/admin/categories/<int:category_id>/delete', methods=['POST'])
 @login_required
 def admin_delete_category(category_id):
+    ensure_category_paths()
     category = Category.query.get_or_404(category_id)
+    detach_category(category)
     db.session.delete(category)
+    bump_stats(categories=-1)
     db.session.commit()
+    page_cache.invalidate()
     flash('Category deleted successfully!', 'success')
     return redirect(url_for('admin_categories'))
 
 @app.route('/admin/media')
 @login_required
+@query_budget(3)
+@read_replica
 def admin_media():
-    media_files = Media.query.order_by(Media.created_at.desc()).all()
-    return render_template('admin/media.html', media_files=media_files)
+    # First page is rendered here; the grid fetches the rest from admin_media_api while scrolling
+    query = filter_media(Media.query.options(selectinload(Media.variants)), request.args)
+    page = keyset_page(query, MEDIA_KEYSET, True, MEDIA_PAGE_SIZE, after=request.args.get('after'))
+    return render_template(
+        'admin/media.html',
+        media_files=page.items,
+        next_cursor=page.next_cursor,
+        file_type=request.args.get('file_type', ''),
+        uploaded_by=request.args.get('uploaded_by', type=int)
+    )
+
+@app.route('/admin/api/media')
+@login_required
+@query_budget(2)
+@read_replica
+def admin_media_api():
+    limit = min(max(request.args.get('limit', MEDIA_PAGE_SIZE, type=int), 1), 200)
+    query = filter_media(Media.query.options(selectinload(Media.variants)), request.args)
+    page = keyset_page(query, MEDIA_KEYSET, True, limit,
+                       after=request.args.get('after'), before=request.args.get('before'))
+    return jsonify({
+        'items': [
+            {
+                'id': media.id,
+                'original_filename': media.original_filename,
+                'file_type': media.file_type,
+                'file_size': media.file_size,
+                'width': media.width,
+                'height': media.height,
+                'uploaded_by': media.uploaded_by,
+                'created_at': media.created_at.isoformat() if media.created_at else None,
+                'url': media.file_path,
+                'srcset': srcset_filter(media),
+            }
+            for media in page.items
+        ],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    })
 
 @app.route('/admin/media/upload', methods=['POST'])
 @login_required
@@ -362,21 +3290,30 @@ def admin_upload_media():
         return redirect(url_for('admin_media'))
     
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Add timestamp to filename to prevent duplicates
-        filename = f"{int(time.time())}_{filename}"
-        
-        file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+        # The parser already streamed the body to a temp file, sizing and hashing it on the way.
+        # Identical bytes are stored once; a repeat upload only takes another reference.
+        upload = file.stream
+        checksum = upload.sha256.hexdigest()
+        extension = os.path.splitext(secure_filename(file.filename))[1].lower()
+        filename = acquire_blob(checksum, extension, upload.commit)
         
         media = Media(
             filename=filename,
             original_filename=file.filename,
             file_type=file.content_type,
-            file_size=os.path.getsize(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+            file_size=upload.size,
+            checksum=checksum,
+            uploaded_by=current_user.id
         )
         
         db.session.add(media)
+        bump_stats(media=1)
         db.session.commit()
+        metrics.inc('cms_uploads_total')
+        metrics.inc('cms_upload_bytes_total', upload.size)
+        
+        # Resized variants are rendered in the background and attached when ready
+        image_pipeline.schedule(media)
         
         flash('File uploaded successfully!', 'success')
     else:
@@ -389,18 +3326,62 @@ def admin_upload_media():
 def admin_delete_media(media_id):
     media = Media.query.get_or_404(media_id)
     
-    # Delete file from filesystem
-    try:
-        os.remove(os.path.join(app.config['UPLOAD_FOLDER'], media.filename))
-    except OSError:
-        pass  # Ignore if file doesn't exist
+    # Shared blobs (and the variants rendered from them) are only removed with their last reference
+    checksum = media.checksum
+    orphaned_path, shared = release_blob(media)
     
     db.session.delete(media)
+    bump_stats(media=-1)
     db.session.commit()
+    # Files go only once the delete has committed, so a failed commit leaves the media intact
+    if orphaned_path and shared:
+        collect_blob(checksum, orphaned_path)
+    elif orphaned_path:
+        remove_upload(orphaned_path)
     
     flash('Media deleted successfully!', 'success')
     return redirect(url_for('admin_media'))
 
+# Content-addressed names change whenever the bytes do, so they can be cached forever
+FINGERPRINTED_MEDIA = re.compile(r'^(?:variants/)?[0-9a-f]{2}/([0-9a-f]{64}(?:-\d+)?)\.[a-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+@app.route('/media/<path:filename>')
+def serve_media(filename):
+    if any(part.startswith('.') for part in filename.split('/')):
+        abort(404)  # temp files of uploads in progress
+    path = safe_join(os.path.abspath(app.config['UPLOAD_FOLDER']), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    
+    # The checksum in the name is a strong validator that needs no disk or database read
+    match = FINGERPRINTED_MEDIA.match(filename)
+    etag = match.group(1) if match else True
+    max_age = IMMUTABLE_MAX_AGE if match else 0
+    
+    if app.config['MEDIA_SENDFILE'] == 'x-accel-redirect':
+        # nginx streams the file (and handles Range) from its internal location
+        response = app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        if match:
+            response.set_etag(etag)
+        if match and request.if_none_match.contains(etag):
+            # nginx would follow the redirect and send the body, so a 304 must not carry it
+            response.status_code = 304
+        else:
+            response.headers['X-Accel-Redirect'] = app.config['MEDIA_ACCEL_PREFIX'] + filename
+    else:
+        # send_file answers If-None-Match/If-Modified-Since and Range requests itself
+        response = send_file(path, etag=etag, max_age=max_age, conditional=True)
+    
+    response.cache_control.public = True
+    if match:
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
 # Helper function for file uploads
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx'}
@@ -442,6 +3423,7 @@ def admin_create_user():
     user.set_password(password)
     
     db.session.add(user)
+    bump_stats(users=1)
     db.session.commit()
     
     flash('User created successfully!', 'success')
@@ -483,6 +3465,9 @@ def admin_edit_user(user_id):
         user.set_password(password)
     
     db.session.commit()
+    user_cache.invalidate(user.id)
+    # Author names appear on public pages
+    page_cache.invalidate()
     
     flash('User updated successfully!', 'success')
     return redirect(url_for('admin_users'))
@@ -501,8 +3486,15 @@ def admin_delete_user(user_id):
         flash('Cannot delete the last admin user.', 'danger')
         return redirect(url_for('admin_users'))
     
+    # Keep their uploads in the library; foreign keys are enforced on SQLite too
+    db.session.execute(
+        db.update(Media).where(Media.uploaded_by == user.id).values(uploaded_by=None)
+        .execution_options(synchronize_session=False)
+    )
     db.session.delete(user)
+    bump_stats(users=-1)
     db.session.commit()
+    user_cache.invalidate(user_id)
     
     flash('User deleted successfully!', 'success')
     return redirect(url_for('admin_users'))
@@ -514,13 +3506,7 @@ def admin_settings():
         flash('Anda tidak memiliki akses ke halaman ini.', 'danger')
         return redirect(url_for('admin_dashboard'))
     
-    settings = Settings.query.first()
-    if not settings:
-        settings = Settings()
-        db.session.add(settings)
-        db.session.commit()
-    
-    return render_template('admin/settings.html', settings=settings)
+    return render_template('admin/settings.html', settings=settings_cache.get())
 
 @app.route('/admin/settings/update', methods=['POST'])
 @login_required
@@ -541,6 +3527,7 @@ def admin_update_settings():
     settings.posts_per_page = int(request.form.get('posts_per_page'))
     
     db.session.commit()
+    settings_cache.invalidate()
     flash('Pengaturan berhasil diperbarui.', 'success')
     return redirect(url_for('admin_settings'))
 
@@ -561,6 +3548,7 @@ def admin_update_notification_settings():
     settings.email_notifications = 'email_notifications' in request.form
     
     db.session.commit()
+    settings_cache.invalidate()
     flash('Pengaturan notifikasi berhasil diperbarui.', 'success')
     return redirect(url_for('admin_settings'))
 
@@ -580,6 +3568,7 @@ def admin_update_privacy_settings():
     settings.require_approval = 'require_approval' in request.form
     
     db.session.commit()
+    settings_cache.invalidate()
     flash('Pengaturan privasi berhasil diperbarui.', 'success')
     return redirect(url_for('admin_settings'))
 
@@ -627,7 +3616,11 @@ def admin_profile():
                 flash('Kata sandi berhasil diperbarui.', 'success')
 
             db.session.commit()
+            user_cache.invalidate(current_user.id)
+            page_cache.invalidate()
             flash('Profil berhasil diperbarui.', 'success')
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             db.session.rollback()
             flash(f'Gagal memperbarui profil: {str(e)}', 'danger')
@@ -648,18 +3641,16 @@ def forgot_password():
                 # Generate password reset token
                 token = generate_password_hash(email + str(datetime.utcnow()))
                 user.reset_token = token
-                db.session.commit()
                 
-                # Send password reset email
+                # Queue password reset email in the same transaction as the token
                 reset_url = url_for('reset_password', token=token, _external=True)
-                msg = Message('Password Reset Request',
-                            recipients=[user.email])
-                msg.body = f'''To reset your password, visit the following link:
+                queue_mail('Password Reset Request', [user.email], f'''To reset your password, visit the following link:
 {reset_url}
 
 If you did not make this request then simply ignore this email.
-'''
-                mail.send(msg)
+''')
+                db.session.commit()
+                mail_sender.wake()
                 
                 flash('Password reset instructions have been sent to your email.', 'success')
                 return redirect(url_for('login'))
@@ -692,21 +3683,44 @@ def reset_password(token):
             user.set_password(password)
             user.reset_token = None
             db.session.commit()
+            user_cache.invalidate(user.id)
             
             flash('Your password has been reset successfully.', 'success')
             return redirect(url_for('login'))
         
         return render_template('admin/reset_password.html')
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         flash(f'Error processing request: {str(e)}', 'danger')
         return redirect(url_for('login'))
 
 @app.route('/admin/posts/<int:post_id>/view')
 @login_required
+@query_budget(3)
+@read_replica
 def admin_view_post(post_id):
-    post = Post.query.get_or_404(post_id)
+    post = Post.query.options(joinedload(Post.author), selectinload(Post.categories)).get_or_404(post_id)
     return render_template('admin/post_view.html', post=post)
 
+@app.route('/metrics')
+def metrics_endpoint():
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/cache-stats')
+@login_required
+def admin_cache_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify({
+        'user_cache': user_cache.stats(),
+        'settings_cache': settings_cache.stats(),
+        'page_cache': page_cache.stats()
+    })
+
 # Error handlers
 @app.errorhandler(404)
 def not_found_error(error):
@@ -717,6 +3731,13 @@ def internal_error(error):
     db.session.rollback()
     return render_template('admin/500.html'), 500
 
+@app.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    # Password changes outside login (users, profile, reset) hit the same bounded hash pool
+    db.session.rollback()
+    flash('Server sedang sibuk, silakan coba lagi sebentar lagi.', 'warning')
+    return render_template('admin/503.html'), 503, {'Retry-After': '5'}
+
 def populate_sample_data():
     """Populate database with sample data"""
     try:
@@ -1119,6 +4140,8 @@ def populate_sample_data():
                 db.session.add(post)
         
         db.session.commit()
+        rebuild_category_paths()
+        reconcile_stats()
         print("Sample data has been populated successfully!")
         
     except Exception as e:
@@ -1143,6 +4166,7 @@ if __name__ == '__main__':
                 )
                 admin.set_password('admin123')
                 db.session.add(admin)
+                bump_stats(users=1)
                 db.session.commit()
                 print('Admin user created successfully!')
             
@@ -0,0 +1,58 @@
+"""Add post full-text search index
+
+Revision ID: f3c8a1d7e245
+Revises: e5a1f7b3d926
+Create Date: 2026-10-18 19:32:05.118204
+
+"""
+import re
+import html
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a1d7e245'
+down_revision = 'e5a1f7b3d926'
+branch_labels = None
+depends_on = None
+
+
+def html_to_text(value):
+    value = re.sub(r'<(script|style)\b.*?</\1>', ' ', value or '', flags=re.S | re.I)
+    return ' '.join(html.unescape(re.sub(r'<[^>]+>', ' ', value)).split())
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5("
+            "title, excerpt, body, tokenize='unicode61 remove_diacritics 2')"
+        )
+        rows = [
+            {'id': row.id, 'title': row.title or '', 'excerpt': html_to_text(row.excerpt),
+             'body': html_to_text(row.content)}
+            for row in bind.execute(sa.text('SELECT id, title, excerpt, content FROM post'))
+        ]
+        if rows:
+            bind.execute(
+                sa.text('INSERT INTO post_fts (rowid, title, excerpt, body) VALUES (:id, :title, :excerpt, :body)'),
+                rows
+            )
+    elif bind.dialect.name == 'postgresql':
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_post_search ON post USING GIN (("
+            "setweight(to_tsvector('simple', coalesce(post.title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(post.excerpt, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(post.content, '')), 'C')))"
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS post_fts')
+    elif bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_post_search')
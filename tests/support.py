@@ -0,0 +1,24 @@
+"""Shared test setup: the app is pointed at a throwaway database before anything imports it"""
+import os
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix='cms-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+os.environ['MAIL_OUTBOX_BACKGROUND'] = 'false'
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+os.environ['METRICS_DIR'] = os.path.join(TEST_DIR, 'metrics')
+
+import app as cms  # noqa: E402
+
+cms.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, UPLOAD_FOLDER=os.path.join(TEST_DIR, 'uploads'))
+os.makedirs(cms.app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+
+def reset_database():
+    """Fresh schema with the sample data loaded; cached pages and settings are dropped"""
+    with cms.app.app_context():
+        cms.db.drop_all()
+        cms.db.create_all()
+        cms.populate_sample_data()
+    cms.settings_cache.invalidate()
+    cms.page_cache.invalidate()
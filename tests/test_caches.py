@@ -0,0 +1,61 @@
+import unittest
+
+from support import cms, reset_database
+
+
+class PageCacheTest(unittest.TestCase):
+    def setUp(self):
+        cms.page_cache.invalidate()
+
+    def test_render_that_straddles_a_write_is_not_cached(self):
+        page, version = cms.page_cache.get('post')
+        self.assertIsNone(page)
+        # A write commits while the miss renders, and another request adopts the new stamp
+        cms.page_cache.invalidate()
+        cms.page_cache.get('other')
+        self.assertEqual(cms.page_cache.put('post', b'stale', version).body, b'stale')
+        self.assertIsNone(cms.page_cache.get('post')[0])
+
+    def test_render_at_current_version_is_cached(self):
+        page, version = cms.page_cache.get('post')
+        cms.page_cache.put('post', b'fresh', version)
+        self.assertEqual(cms.page_cache.get('post')[0].body, b'fresh')
+
+
+class UserCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        reset_database()
+        with cms.app.app_context():
+            cls.admin_id = cms.User.query.filter_by(username='admin').one().id
+
+    def setUp(self):
+        cms.user_cache.invalidate(self.admin_id)
+
+    def test_row_read_before_an_invalidation_is_not_cached(self):
+        values, version = cms.user_cache.get(self.admin_id)
+        self.assertIsNone(values)
+        # The role changes and commits while the miss is loading the old row
+        cms.user_cache.invalidate(self.admin_id)
+        cms.user_cache.put(self.admin_id, {'id': self.admin_id, 'role': 'author'}, version)
+        self.assertIsNone(cms.user_cache.get(self.admin_id)[0])
+
+    def test_secrets_stay_out_of_the_cache(self):
+        client = cms.app.test_client()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+        self.assertEqual(client.get('/admin').status_code, 200)
+        values, version = cms.user_cache.get(self.admin_id)
+        self.assertEqual(set(values), set(cms.SESSION_USER_COLUMNS))
+
+        # A cached session user still loads its password hash when the profile checks it
+        response = client.post('/admin/profile', data={
+            'username': 'admin', 'email': 'admin@example.com', 'full_name': 'Administrator',
+            'current_password': 'admin123', 'new_password': 'rahasia456', 'confirm_password': 'rahasia456'
+        })
+        self.assertEqual(response.status_code, 200)
+        with cms.app.app_context():
+            self.assertTrue(cms.db.session.get(cms.User, self.admin_id).check_password('rahasia456'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import socketserver
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from support import cms, reset_database
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Just enough SMTP to accept or refuse messages, counting connections and deliveries"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.reject = False
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 stand-in')
+        data = None
+        for line in self.rfile:
+            if data is not None:
+                if line == b'.\r\n':
+                    server.messages.append(b''.join(data))
+                    data = None
+                    self.reply('250 queued')
+                else:
+                    data.append(line)
+                continue
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 stand-in')
+            elif command == b'RCPT' and server.reject:
+                self.reply('550 mailbox unavailable')
+            elif command == b'DATA':
+                data = []
+                self.reply('354 go ahead')
+            elif command == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class MailOutboxTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        reset_database()
+        cls.smtp = SMTPStandIn()
+        cls.config = dict(cms.app.config)
+        cms.app.config.update(
+            MAIL_SERVER='127.0.0.1', MAIL_PORT=cls.smtp.server_address[1], MAIL_USE_TLS=False,
+            MAIL_USERNAME=None, MAIL_PASSWORD=None, MAIL_SUPPRESS_SEND=False,
+            MAIL_DEFAULT_SENDER='cms@example.com', MAIL_OUTBOX_BATCH_SIZE=2,
+            MAIL_OUTBOX_MAX_ATTEMPTS=3, MAIL_OUTBOX_RETRY_DELAY=30
+        )
+        cms.mail.init_app(cms.app)
+
+    @classmethod
+    def tearDownClass(cls):
+        cms.app.config.update(cls.config)
+        cms.mail.init_app(cms.app)
+        cls.smtp.shutdown()
+        cls.smtp.server_close()
+
+    def setUp(self):
+        self.smtp.reject = False
+        self.smtp.messages.clear()
+        self.smtp.connections = 0
+        with cms.app.app_context():
+            cms.MailOutbox.query.delete()
+            cms.db.session.commit()
+
+    def queue(self, count):
+        with cms.app.app_context():
+            messages = [cms.queue_mail(f'Pesan {n}', [f'user{n}@example.com'], 'Halo') for n in range(count)]
+            cms.db.session.commit()
+            return [message.id for message in messages]
+
+    def test_each_batch_goes_over_one_connection(self):
+        self.queue(5)
+        with cms.app.app_context():
+            self.assertEqual([cms.drain_outbox() for _ in range(4)], [2, 2, 1, 0])
+            self.assertEqual(cms.MailOutbox.query.filter_by(status='sent').count(), 5)
+        self.assertEqual(self.smtp.connections, 3)
+        self.assertEqual(len(self.smtp.messages), 5)
+
+    def test_failures_back_off_exponentially_then_give_up(self):
+        message_id, = self.queue(1)
+        self.smtp.reject = True
+        delays = []
+        with cms.app.app_context():
+            for attempt in range(1, 4):
+                started = datetime.utcnow()
+                self.assertEqual(cms.drain_outbox(), 0)
+                message = cms.db.session.get(cms.MailOutbox, message_id)
+                self.assertEqual(message.attempts, attempt)
+                self.assertIn('550', message.last_error)
+                self.assertIsNone(message.claim_token)
+                if attempt < 3:
+                    self.assertEqual(message.status, 'pending')
+                    delays.append((message.next_attempt_at - started).total_seconds())
+                    # Not due yet: the next drain leaves it alone
+                    connections = self.smtp.connections
+                    self.assertEqual(cms.drain_outbox(), 0)
+                    self.assertEqual(self.smtp.connections, connections)
+                    message.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+                    cms.db.session.commit()
+            self.assertEqual(message.status, 'failed')
+        self.assertAlmostEqual(delays[0], 30, delta=2)
+        self.assertAlmostEqual(delays[1], 60, delta=2)
+        self.assertEqual(self.smtp.messages, [])
+
+    def test_retry_is_sent_once_the_server_recovers(self):
+        message_id, = self.queue(1)
+        self.smtp.reject = True
+        with cms.app.app_context():
+            self.assertEqual(cms.drain_outbox(), 0)
+            cms.db.session.get(cms.MailOutbox, message_id).next_attempt_at = datetime.utcnow()
+            cms.db.session.commit()
+            self.smtp.reject = False
+            self.assertEqual(cms.drain_outbox(), 1)
+            message = cms.db.session.get(cms.MailOutbox, message_id)
+            self.assertEqual((message.status, message.attempts), ('sent', 1))
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_sender_starts_with_the_first_request(self):
+        # Mail queued before a restart goes out without waiting for new mail to be queued
+        self.queue(1)
+        cms.app.config.update(MAIL_OUTBOX_BACKGROUND=True, MAIL_OUTBOX_POLL_INTERVAL=3600)
+        try:
+            self.assertEqual(cms.app.test_client().get('/admin/login').status_code, 200)
+            deadline = time.monotonic() + 5
+            while not self.smtp.messages and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            cms.app.config['MAIL_OUTBOX_BACKGROUND'] = False
+        self.assertEqual(len(self.smtp.messages), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import hashlib
+import io
+import os
+import unittest
+from unittest import mock
+
+from support import cms, reset_database
+
+
+class MediaBlobTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        reset_database()
+        cls.client = cms.app.test_client()
+        response = cls.client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+        assert response.status_code == 302, response.status_code
+
+    def upload(self, payload):
+        response = self.client.post('/admin/media/upload', data={'file': (io.BytesIO(payload), 'laporan.pdf')},
+                                    content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 302)
+        with cms.app.app_context():
+            media = cms.Media.query.order_by(cms.Media.id.desc()).first()
+            return media.id, os.path.join(cms.app.config['UPLOAD_FOLDER'], media.filename)
+
+    def blob(self, media_id):
+        with cms.app.app_context():
+            media = cms.db.session.get(cms.Media, media_id)
+            return cms.MediaBlob.query.filter_by(checksum=media.checksum).one_or_none()
+
+    def test_file_goes_with_the_last_reference(self):
+        payload = os.urandom(4096)
+        first, path = self.upload(payload)
+        second, _ = self.upload(payload)
+        self.assertEqual(self.blob(second).ref_count, 2)
+        self.client.post(f'/admin/media/{first}/delete')
+        self.assertTrue(os.path.exists(path))
+        self.client.post(f'/admin/media/{second}/delete')
+        self.assertFalse(os.path.exists(path))
+        with cms.app.app_context():
+            self.assertEqual(cms.MediaBlob.query.filter_by(path=os.path.relpath(path, cms.app.config['UPLOAD_FOLDER'])).count(), 0)
+
+    def test_failed_delete_keeps_the_file(self):
+        media_id, path = self.upload(os.urandom(4096))
+        with mock.patch.object(cms.db.session, 'commit', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(f'/admin/media/{media_id}/delete')
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.blob(media_id).ref_count, 1)
+
+    def test_upload_restores_a_file_lost_by_an_interrupted_delete(self):
+        payload = os.urandom(4096)
+        media_id, path = self.upload(payload)
+        # The last delete removed the file, then failed to commit dropping the unreferenced row
+        with cms.app.app_context():
+            cms.MediaBlob.query.filter_by(checksum=hashlib.sha256(payload).hexdigest()).update({'ref_count': 0})
+            cms.db.session.delete(cms.db.session.get(cms.Media, media_id))
+            cms.db.session.commit()
+        os.remove(path)
+        self.upload(payload)
+        with open(path, 'rb') as stored:
+            self.assertEqual(stored.read(), payload)
+
+    def test_undecodable_image_is_stored_without_variants_when_rendering_inline(self):
+        workers = cms.app.config['IMAGE_WORKERS']
+        cms.app.config['IMAGE_WORKERS'] = 0
+        try:
+            with self.assertLogs(cms.app.logger, 'ERROR'):
+                response = self.client.post('/admin/media/upload', data={'file': (io.BytesIO(b'not a png'), 'rusak.png')},
+                                            content_type='multipart/form-data')
+        finally:
+            cms.app.config['IMAGE_WORKERS'] = workers
+        self.assertEqual(response.status_code, 302)
+        with cms.app.app_context():
+            media = cms.Media.query.filter_by(original_filename='rusak.png').one()
+            self.assertIsNone(media.width)
+            self.assertEqual(media.variants, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
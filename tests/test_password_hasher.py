@@ -0,0 +1,46 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from werkzeug.security import generate_password_hash
+
+from support import cms
+
+
+class PasswordHasherTest(unittest.TestCase):
+    def test_canonical_method_matches_what_werkzeug_stores(self):
+        for method in ('pbkdf2', 'pbkdf2:sha512', 'pbkdf2:sha256:1000', 'scrypt', 'scrypt:16384:8:1'):
+            with self.subTest(method=method):
+                hasher = cms.PasswordHasher(method, 1, 1, 0)
+                stored = generate_password_hash('rahasia', method)
+                self.assertEqual(hasher.canonical_method(), stored.split('$', 1)[0])
+                self.assertFalse(hasher.needs_rehash(stored))
+
+    def test_needs_rehash_does_not_hash(self):
+        hasher = cms.PasswordHasher('pbkdf2:sha256:600000', 1, 1, 0)
+        with mock.patch.object(cms, 'generate_password_hash') as generate:
+            self.assertTrue(hasher.needs_rehash(generate_password_hash('rahasia', 'pbkdf2:sha256:1000')))
+            self.assertTrue(hasher.needs_rehash(None))
+        generate.assert_not_called()
+
+    def test_callers_beyond_max_pending_fail_fast(self):
+        hasher = cms.PasswordHasher('pbkdf2:sha256:1000', 1, 1, 0)
+        release = threading.Event()
+        worker = threading.Thread(target=hasher._run, args=(release.wait,))
+        worker.start()
+        try:
+            time.sleep(0.05)
+            started = time.monotonic()
+            with cms.app.app_context(), self.assertRaises(cms.PasswordHasherBusy):
+                hasher.hash('rahasia')
+            self.assertLess(time.monotonic() - started, 0.5)
+        finally:
+            release.set()
+            worker.join()
+        with cms.app.app_context():
+            self.assertTrue(hasher.hash('rahasia').startswith('pbkdf2:sha256:1000$'))
+
+
+if __name__ == '__main__':
+    unittest.main()
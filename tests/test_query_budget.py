@@ -0,0 +1,76 @@
+import re
+import unittest
+
+from support import cms, reset_database
+
+
+class QueryBudgetTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        reset_database()
+        result = cms.app.test_cli_runner().invoke(args=[
+            'seed-data', '--users', '6', '--categories', '15', '--posts', '120', '--media', '80', '--batch-size', '50'
+        ])
+        assert result.exit_code == 0, result.output
+        cls.client = cms.app.test_client()
+        response = cls.client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+        assert response.status_code == 302, response.status_code
+        with cms.app.app_context():
+            cls.post = cms.Post.query.filter_by(status='published').order_by(cms.Post.id).first()
+            cls.category = cms.Category.query.filter(cms.Category.parent_id.isnot(None)).first()
+
+    def get(self, url):
+        # Cold caches: the budgets include the settings load and a page render
+        cms.settings_cache.invalidate()
+        cms.page_cache.invalidate()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def test_admin_routes_stay_within_budget(self):
+        urls = ['/admin', '/admin/categories', '/admin/media', '/admin/api/media', '/admin/api/media?file_type=image/',
+                f'/admin/posts/{self.post.id}/view', '/admin/posts?q=energi', '/admin/posts?status=draft']
+        urls += [f'/admin/posts?sort={sort}' for sort in cms.POST_SORTS]
+        for url in urls:
+            with self.subTest(url=url):
+                self.get(url)
+
+    def test_later_pages_stay_within_budget(self):
+        after = re.search(r'after=([\w-]+)', self.get('/admin/posts?sort=title').data.decode())
+        self.assertIsNotNone(after)
+        self.get(f'/admin/posts?sort=title&after={after.group(1)}')
+        cursor = self.get('/admin/api/media?limit=20').get_json()['next_cursor']
+        self.assertIsNotNone(cursor)
+        self.get(f'/admin/api/media?limit=20&after={cursor}')
+
+    def test_public_pages_stay_within_budget(self):
+        self.get(f'/post/{self.post.slug}')
+        self.get(f'/category/{self.category.slug}')
+
+    def test_over_budget_view_raises(self):
+        @cms.query_budget(1)
+        def view():
+            cms.User.query.count()
+            cms.Post.query.count()
+            return 'ok'
+
+        with cms.app.test_request_context('/'):
+            with self.assertRaises(cms.QueryBudgetExceeded):
+                view()
+
+    def test_over_budget_view_only_warns_when_not_strict(self):
+        @cms.query_budget(0)
+        def view():
+            cms.Post.query.count()
+            return 'ok'
+
+        cms.app.config['QUERY_BUDGET_STRICT'] = False
+        try:
+            with cms.app.test_request_context('/'), self.assertLogs(cms.app.logger, 'WARNING'):
+                self.assertEqual(view(), 'ok')
+        finally:
+            cms.app.config['QUERY_BUDGET_STRICT'] = None
+
+
+if __name__ == '__main__':
+    unittest.main()
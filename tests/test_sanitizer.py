@@ -0,0 +1,26 @@
+import unittest
+
+from support import cms
+
+sanitize_html = cms.sanitize_html
+
+
+class SanitizeURLTest(unittest.TestCase):
+    def test_control_characters_inside_javascript_scheme(self):
+        for charref in ('&#9;', '&#10;', '&#13;', '&#0;'):
+            with self.subTest(charref=charref):
+                html = sanitize_html(f'<a href="java{charref}script:alert(1)">x</a>')
+                self.assertNotIn('href', html)
+                self.assertNotIn('script:', html)
+
+    def test_leading_whitespace_and_case(self):
+        self.assertNotIn('href', sanitize_html('<a href=" &#1;JavaScript:alert(1)">x</a>'))
+
+    def test_allowed_urls_are_kept(self):
+        for url in ('https://example.com/a?b=1', 'mailto:a@example.com', '/relative/path', '#top'):
+            with self.subTest(url=url):
+                self.assertIn(f'href="{url}"', sanitize_html(f'<a href="{url}">x</a>'))
+
+
+if __name__ == '__main__':
+    unittest.main()
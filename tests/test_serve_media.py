@@ -0,0 +1,37 @@
+import io
+import os
+import unittest
+
+from support import cms, reset_database
+
+
+class AccelRedirectTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        reset_database()
+        client = cms.app.test_client()
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+        client.post('/admin/media/upload', data={'file': (io.BytesIO(os.urandom(2048)), 'lampiran.pdf')},
+                    content_type='multipart/form-data')
+        with cms.app.app_context():
+            cls.filename = cms.Media.query.order_by(cms.Media.id.desc()).first().filename
+
+    def setUp(self):
+        cms.app.config['MEDIA_SENDFILE'] = 'x-accel-redirect'
+        self.addCleanup(cms.app.config.update, MEDIA_SENDFILE='')
+
+    def test_full_response_hands_the_file_to_nginx(self):
+        response = cms.app.test_client().get(f'/media/{self.filename}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Accel-Redirect'], '/_uploads/' + self.filename)
+
+    def test_not_modified_has_no_redirect(self):
+        client = cms.app.test_client()
+        etag = client.get(f'/media/{self.filename}').headers['ETag']
+        response = client.get(f'/media/{self.filename}', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn('X-Accel-Redirect', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()